@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class Config(AppConfig):
     name = 'srt'
+
+    def ready(self):
+        from srt.core import checks  # noqa: registers them
+        from srt.core.db import connect_signals
+        connect_signals()
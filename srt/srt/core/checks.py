@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register()
+def check_sql_user(app_configs, **kwargs):
+    """ Sql written by users must run as a role that can only read, see DATABASE_SQL_USER. """
+    if settings.DATABASE_SQL_USER:
+        return []
+    return [checks.Warning(
+        'DATABASE_SQL_USER is not set, sql reports run as the main database user',
+        hint='Create a role granted SELECT only and set DATABASE_SQL_USER and DATABASE_SQL_PASSWORD',
+        id='srt.W001',
+    )]
@@ -0,0 +1,121 @@
+import time
+import threading
+
+from celery import signals as celery_signals
+from django.conf import settings
+from django.core import signals
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from srt.core.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class PoolStats:
+    """
+    Counters of the persistent connections of the process: checkouts (requests and tasks served), health_checks
+    (connections idle for DATABASE_HEALTH_CHECK_IDLE seconds checked before a checkout) and the seconds they took,
+    connects and reconnects (connections opened again after the first). They are logged every
+    DATABASE_STATS_INTERVAL seconds by API and worker processes alike, and on worker process shutdown.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.health_checks = 0
+        self.health_check_seconds = 0.0
+        self.connects = 0
+        self.reconnects = 0
+        self.aliases = set()
+        self.logged = time.monotonic()
+
+    def checkout(self):
+        with self.lock:
+            self.checkouts += 1
+
+    def health_check(self, seconds):
+        with self.lock:
+            self.health_checks += 1
+            self.health_check_seconds += seconds
+
+    def connect(self, alias):
+        with self.lock:
+            self.connects += 1
+            if alias in self.aliases:
+                self.reconnects += 1
+            self.aliases.add(alias)
+
+    def due(self):
+        """ Whether DATABASE_STATS_INTERVAL seconds passed since the stats were last logged, once per interval. """
+        with self.lock:
+            if time.monotonic() - self.logged < settings.DATABASE_STATS_INTERVAL:
+                return False
+            self.logged = time.monotonic()
+            return True
+
+    def as_dict(self):
+        return {'checkouts': self.checkouts, 'health_checks': self.health_checks,
+                'health_check_seconds': round(self.health_check_seconds, 6), 'connects': self.connects,
+                'reconnects': self.reconnects}
+
+
+stats = PoolStats()
+
+
+def checkout(**kwargs):
+    """
+    Drop expired, failed or broken connections before a request or a task, they reconnect on first use. Only
+    connections idle for DATABASE_HEALTH_CHECK_IDLE seconds are checked with a round trip, the others were just
+    working.
+    """
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        connection.close_if_unusable_or_obsolete()
+        idle = time.monotonic() - getattr(connection, 'last_released', 0)
+        if connection.connection is not None and idle >= settings.DATABASE_HEALTH_CHECK_IDLE:
+            started = time.monotonic()
+            usable = connection.is_usable()
+            stats.health_check(time.monotonic() - started)
+            if not usable:
+                logger.warning(f'dropping broken connection to {connection.alias}')
+                connection.close()
+    stats.checkout()
+    if stats.due():
+        log_stats()
+
+
+def release(**kwargs):
+    """ Give connections back for reuse after a request or a task, unless they expired (CONN_MAX_AGE) or failed. """
+    for connection in connections.all():
+        if connection.connection is not None and not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+            connection.last_released = time.monotonic()
+
+
+def reset(**kwargs):
+    """ Start counting afresh in forked worker processes, celery's django fixup drops the inherited connections. """
+    stats.reset()
+
+
+def on_connection_created(sender, connection, **kwargs):
+    stats.connect(connection.alias)
+
+
+def log_stats(**kwargs):
+    logger.info(f'database connections: {stats.as_dict()}')
+
+
+def connect_signals():
+    connection_created.connect(on_connection_created, dispatch_uid='srt.core.db.created')
+    signals.request_started.connect(checkout, dispatch_uid='srt.core.db.request_started')
+    signals.request_finished.connect(release, dispatch_uid='srt.core.db.request_finished')
+    celery_signals.worker_process_init.connect(reset, dispatch_uid='srt.core.db.process_init', weak=False)
+    celery_signals.task_prerun.connect(checkout, dispatch_uid='srt.core.db.prerun', weak=False)
+    celery_signals.task_postrun.connect(release, dispatch_uid='srt.core.db.postrun', weak=False)
+    celery_signals.worker_process_shutdown.connect(log_stats, dispatch_uid='srt.core.db.shutdown', weak=False)
@@ -0,0 +1,112 @@
+import json
+import time
+import threading
+
+import redis
+from django.conf import settings
+
+from srt.core.helpers import get_logger
+from srt.core.locks import get_redis
+from srt.core.models import TERMINAL
+
+
+logger = get_logger(__name__)
+
+TYPES = ['reports', 'deliveries']  # app labels of the history models publishing events
+RETRY = 30  # seconds without publishing after a redis failure, tasks never wait on a broken redis
+
+_failed = None
+
+
+def get_channel(type):
+    return f'srt:events:{type}'
+
+
+def format_event(event):
+    return f'event: {event["type"]}\ndata: {json.dumps(event, default=str)}\n\n'
+
+
+def publish(instance, client=None, **data):
+    """ Publish data about a history row to the subscribers of its app, best effort. """
+    global _failed
+    if _failed and time.monotonic() - _failed < RETRY:
+        return
+    message = json.dumps({'type': instance._meta.app_label, 'id': instance.id, **data}, default=str)
+    try:
+        (client or get_redis()).publish(get_channel(instance._meta.app_label), message)
+        _failed = None
+    except redis.RedisError as e:
+        logger.warning(f'unable to publish events for {RETRY} seconds: {e}')
+        _failed = time.monotonic()
+
+
+def subscribe(types, client=None):
+    """ Subscription to the events of types, take it before reading the state they change to miss none. """
+    pubsub = (client or get_redis()).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(*[get_channel(type) for type in types])
+    return pubsub
+
+
+def stream(pubsub, ids=None, heartbeat=None, max_age=None):
+    """
+    Server-sent events of a subscription, only about ids when set. A comment line is sent every heartbeat seconds
+    to keep the connection open, the stream ends once every id reached a terminal status, or after max_age
+    seconds: clients reconnect then and get a new snapshot.
+    """
+    heartbeat = settings.EVENTS_HEARTBEAT if heartbeat is None else heartbeat
+    max_age = settings.EVENTS_MAX_AGE if max_age is None else max_age
+    remaining = set(ids or [])
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < max_age:
+            message = pubsub.get_message(timeout=heartbeat)
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+            event = json.loads(message['data'])
+            if ids and event['id'] not in ids:
+                continue
+            yield format_event(event)
+            if ids and event.get('status') in TERMINAL:
+                remaining.discard(event['id'])
+                if not remaining:
+                    return
+    finally:
+        pubsub.close()
+
+
+class Stream:
+    """
+    Body of a streaming response: snapshot events, then the events of pubsub about ids, see stream(). Every open
+    stream holds a server thread, so a process serves EVENTS_MAX_STREAMS at most and open() returns None beyond.
+    The slot is freed once the response is closed, whether it was read or not.
+    """
+    lock = threading.Lock()
+    opened = 0
+
+    @classmethod
+    def open(cls, pubsub, ids, snapshot=()):
+        with cls.lock:
+            if cls.opened >= settings.EVENTS_MAX_STREAMS:
+                return None
+            cls.opened += 1
+        return cls(pubsub, ids, snapshot)
+
+    def __init__(self, pubsub, ids, snapshot=()):
+        self.pubsub = pubsub
+        self.snapshot = list(snapshot)
+        self.events = stream(pubsub, ids)
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.snapshot
+        yield from self.events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.events.close()
+        self.pubsub.close()  # the subscription is only closed by stream() once it started
+        with self.lock:
+            Stream.opened -= 1
@@ -0,0 +1,179 @@
+import io
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from srt.core.pipeline import CsvFormatter
+
+
+class JsonLinesFormatter:
+    """ Encode a batch of rows into json lines, rows become objects when columns are known. """
+
+    def __init__(self, columns=None, encoding='utf-8'):
+        self.columns = columns
+        self.encoding = encoding
+
+    def __call__(self, batch):
+        if self.columns:
+            batch = [dict(zip(self.columns, row)) for row in batch]
+        lines = [json.dumps(row, default=str) for row in batch]
+        return ('\n'.join(lines) + '\n').encode(self.encoding)
+
+
+class ParquetFormatter:
+    """ Write every batch as one parquet row group, the file footer is returned by close(). """
+
+    def __init__(self, columns=None):
+        if not pyarrow:
+            raise ImportError('pyarrow is required for the parquet format')
+        self.columns = columns
+        self.buffer = io.BytesIO()
+        self.writer = None
+
+    def __call__(self, batch):
+        columns = self.columns or [f'column_{i}' for i in range(len(batch[0]))]
+        table = pyarrow.Table.from_arrays([pyarrow.array(list(values)) for values in zip(*batch)], names=columns)
+        if not self.writer:
+            self.writer = pyarrow.parquet.ParquetWriter(self.buffer, table.schema)
+        self.writer.write_table(table)
+        return self.drain()
+
+    def close(self):
+        if not self.writer:  # no rows, the file still needs a schema to be valid
+            schema = pyarrow.schema([(column, pyarrow.null()) for column in self.columns or []])
+            self.writer = pyarrow.parquet.ParquetWriter(self.buffer, schema)
+        self.writer.close()
+        return self.drain()
+
+    def drain(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+class CompressedFormatter:
+    """ Compress the output of another formatter as a single stream. """
+
+    def __init__(self, formatter, compressor):
+        self.formatter = formatter
+        self.compressor = compressor
+
+    def __call__(self, batch):
+        return self.compressor.compress(self.formatter(batch))
+
+    def close(self):
+        close = getattr(self.formatter, 'close', None)
+        data = self.compressor.compress(close()) if close else b''
+        return data + self.compressor.flush()
+
+
+class CompressedWriter:
+    """ Binary file-like object compressing everything written into file, close() writes the trailer. """
+
+    def __init__(self, file, compressor):
+        self.file = file
+        self.compressor = compressor
+
+    def write(self, data):
+        self.file.write(self.compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+
+
+def gzip_compressor():
+    return zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+
+
+def zstd_compressor():
+    if not zstandard:
+        raise ImportError('zstandard is required for zstd compression')
+    return zstandard.ZstdCompressor().compressobj()
+
+
+class HeaderFormatter:
+    """ Prefix the first batch with a header, close() returns it when there was no batch. """
+
+    def __init__(self, formatter, header):
+        self.formatter = formatter
+        self.header = header
+        self.pending = header
+
+    def __call__(self, batch):
+        header, self.pending = self.pending, b''
+        return header + self.formatter(batch)
+
+    def close(self):
+        header, self.pending = self.pending, b''
+        close = getattr(self.formatter, 'close', None)
+        return header + (close() if close else b'')
+
+
+def csv_formatter(columns=None):
+    formatter = CsvFormatter()
+    return HeaderFormatter(formatter, formatter([columns])) if columns else formatter
+
+
+class Format:
+    """ Output format of a report artifact, the name doubles as the file extension. """
+
+    def __init__(self, name, content_type, formatter, compressor=None, content_encoding=None, concatenable=True):
+        self.name = name
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.formatter_class = formatter
+        self.compressor = compressor
+        self.concatenable = concatenable  # files can be joined byte-wise, gzip members and zstd frames included
+
+    @property
+    def extension(self):
+        return self.name
+
+    def formatter(self, columns=None, header=True):
+        formatter = self.formatter_class(columns)
+        if not header and isinstance(formatter, HeaderFormatter):
+            formatter = formatter.formatter
+        return CompressedFormatter(formatter, self.compressor()) if self.compressor else formatter
+
+    def writer(self, file):
+        """ Wrap file to receive already formatted bytes, e.g. from a database export. """
+        return CompressedWriter(file, self.compressor()) if self.compressor else file
+
+    def header(self, columns=None):
+        """ Header as a standalone (compressed) chunk, to prefix files joined from headerless parts. """
+        formatter = self.formatter_class(columns)
+        data = formatter.header if isinstance(formatter, HeaderFormatter) else b''
+        if data and self.compressor:
+            compressor = self.compressor()
+            data = compressor.compress(data) + compressor.flush()
+        return data
+
+
+FORMATS = {format.name: format for format in [
+    Format('csv', 'text/csv', csv_formatter),
+    Format('csv.gz', 'text/csv', csv_formatter, gzip_compressor, 'gzip'),
+    Format('csv.zst', 'text/csv', csv_formatter, zstd_compressor, 'zstd'),
+    Format('jsonl', 'application/x-ndjson', JsonLinesFormatter),
+    Format('jsonl.gz', 'application/x-ndjson', JsonLinesFormatter, gzip_compressor, 'gzip'),
+    Format('jsonl.zst', 'application/x-ndjson', JsonLinesFormatter, zstd_compressor, 'zstd'),
+    Format('parquet', 'application/vnd.apache.parquet', ParquetFormatter, concatenable=False),
+]}
+
+
+def get_format(name=None):
+    try:
+        return FORMATS[name or 'csv']
+    except KeyError:
+        raise ValueError(f'Unknown format {name}, expected one of {", ".join(FORMATS)}')
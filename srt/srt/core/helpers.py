@@ -1,4 +1,5 @@
 import logging
+import datetime
 
 
 def true(value: str) -> bool:
@@ -28,3 +29,14 @@ def pluralize(count, singular, plural=None):
 
 def get_logger(path):
     return logging.getLogger(path)
+
+
+def date_range(start, end, days=1):
+    """ Split the inclusive start/end ISO dates into consecutive (start, end) ISO date windows of days. """
+    start, end = datetime.date.fromisoformat(str(start)), datetime.date.fromisoformat(str(end))
+    windows = []
+    while start <= end:
+        last = min(start + datetime.timedelta(days=days - 1), end)
+        windows.append((start.isoformat(), last.isoformat()))
+        start = last + datetime.timedelta(days=1)
+    return windows
@@ -0,0 +1,96 @@
+import uuid
+import threading
+
+import redis
+from django.conf import settings
+
+from srt.core.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+LEASE_TTL = 60  # seconds
+
+RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+EXTEND = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=5)
+    return _client
+
+
+class Lease:
+    """
+    Distributed lock on the redis broker. It expires after ttl seconds unless its holder is alive: a heartbeat
+    thread extends it every ttl / 3 seconds until release(), so a crashed worker never blocks a report forever.
+    The value (e.g. a history id) tells other workers who holds it:
+
+      lease = Lease('report-1', history.id)
+      if lease.acquire():
+          try:
+              ...
+          finally:
+              lease.release()
+      else:
+          running_history_id = lease.holder()
+
+    A lease can be handed over to other tasks: they rebuild it from its token to extend or release it.
+    """
+
+    def __init__(self, name, value='', ttl=LEASE_TTL, client=None, token=None):
+        self.key = f'srt:lease:{name}'
+        self.token = token or f'{value}:{uuid.uuid4()}'
+        self.ttl = ttl
+        self.client = client or get_redis()
+        self.stopped = threading.Event()
+        self.heartbeat = None
+
+    def acquire(self):
+        if not self.client.set(self.key, self.token, nx=True, px=int(self.ttl * 1000)):
+            return False
+        self.stopped.clear()
+        self.heartbeat = threading.Thread(target=self.beat, name=f'heartbeat {self.key}', daemon=True)
+        self.heartbeat.start()
+        return True
+
+    def beat(self):
+        while not self.stopped.wait(self.ttl / 3):
+            try:
+                if not self.extend():
+                    logger.error(f'lease {self.key} was lost')
+                    return
+            except redis.RedisError as e:
+                logger.warning(f'unable to extend lease {self.key}: {e}')
+
+    def extend(self, ttl=None):
+        return bool(self.client.eval(EXTEND, 1, self.key, self.token, int((ttl or self.ttl) * 1000)))
+
+    def stop(self):
+        """ Stop the heartbeat without releasing, the lease expires after its ttl unless extended. """
+        self.stopped.set()
+        if self.heartbeat:
+            self.heartbeat.join()
+            self.heartbeat = None
+
+    def release(self):
+        self.stop()
+        return bool(self.client.eval(RELEASE, 1, self.key, self.token))
+
+    def holder(self):
+        value = self.client.get(self.key)
+        return value.decode().rsplit(':', 1)[0] if value else None
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from srt.core.retention import partition, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Convert a history table into monthly range partitions on created (deliveries_history by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', nargs='?', default='deliveries_history')
+
+    def handle(self, table, **options):
+        if is_partitioned(table):
+            raise CommandError(f'{table} is already partitioned')
+        try:
+            partition(table, settings.HISTORY_PARTITIONS_AHEAD)
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(f'{table} is partitioned by month')
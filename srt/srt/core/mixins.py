@@ -1,3 +1,5 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.safestring import mark_safe
 
 from srt.core.helpers import pluralize, delimit
@@ -19,9 +21,16 @@ class BaseAdminMixin:
         html = self.get_href(obj.action_url, label or obj.__class__.__name__)
         return mark_safe(html)
 
-    def get_url(self, cls, singular=None, plural=None, **kw):
+    def get_url(self, cls, singular=None, plural=None, count=None, **kw):
+        """ Link to the cls rows filtered by kw, count is queried unless given, e.g. annotated by get_count. """
         link = cls.get_admin_url(**kw)
-        count = cls.objects.filter(**kw).count()
+        count = cls.objects.filter(**kw).count() if count is None else count
         label = pluralize(count, singular or cls.__name__.lower(), plural=plural)
         html = self.get_href(link, count, label)
         return mark_safe(html)
+
+    @staticmethod
+    def get_count(cls, field):
+        """ Annotation counting the cls rows pointing to each row through field, one index lookup per row. """
+        rows = cls.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        return Coalesce(Subquery(rows.annotate(count=Count('*')).values('count'), output_field=IntegerField()), 0)
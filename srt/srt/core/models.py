@@ -10,6 +10,7 @@ from srt.core.helpers import delimit
 STATUS = Choices('pending', 'processing', 'stopped', 'failed', 'completed')
 BUSY = [STATUS.pending, STATUS.processing]
 DONE = [STATUS.completed]
+TERMINAL = [STATUS.stopped, STATUS.failed, STATUS.completed]
 
 
 class BaseModel(models.Model):
@@ -50,3 +51,10 @@ class BaseModel(models.Model):
             for key, value in kwargs.items():
                 setattr(self, key, value)
             self.save(update_fields=list(kwargs.keys()))
+
+    def tracker(self, interval=None):
+        """ Progress buffering status changes of the instance, shared by every caller, see srt.core.progress. """
+        from srt.core.progress import Progress
+        if getattr(self, '_tracker', None) is None:
+            self._tracker = Progress(self, interval)
+        return self._tracker
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: pages are fetched with WHERE id < last seen id, so a deep page costs
+    the same index lookup as the first one, unlike LimitOffsetPagination which scans every skipped row. Ids grow
+    with created, so the order is also the creation order. Responses have next/previous cursor links, no count.
+    """
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 1000
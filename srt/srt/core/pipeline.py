@@ -0,0 +1,140 @@
+import io
+import csv
+import time
+from itertools import islice
+
+from srt.core.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = 10000  # rows
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+
+
+class Stats:
+    """ Rows and bytes that passed through a pipeline stage and the time spent inside it. """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def add(self, rows=0, bytes=0, seconds=0.0):
+        self.rows += rows
+        self.bytes += bytes
+        self.seconds += seconds
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_sec(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f'{self.name}: {self.rows} rows, {self.bytes} bytes, {self.seconds:.3f}s ' \
+               f'({self.rows_per_sec:.0f} rows/s, {self.bytes_per_sec:.0f} bytes/s)'
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class CsvFormatter:
+    """ Encode a batch of rows into csv bytes. """
+
+    def __init__(self, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL, encoding='utf-8'):
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.quoting = quoting
+        self.encoding = encoding
+
+    def __call__(self, batch):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=self.delimiter, quotechar=self.quotechar, quoting=self.quoting)
+        writer.writerows(batch)
+        return buffer.getvalue().encode(self.encoding)
+
+
+class Pipeline:
+    """
+    Stream rows from a source iterator into a binary file-like sink with constant memory:
+
+      source -> batches of batch_size rows -> formatter -> chunks of at least chunk_size bytes -> sink.write
+
+    Each stage keeps its own Stats, so a slow query, a slow encoder and a slow sink are easy to tell apart.
+    progress, when set, is called with the number of rows written after every chunk:
+
+      pipeline = Pipeline(task.rows(history, params))
+      with open(local, 'wb') as file:
+          pipeline.run(file)
+    """
+
+    def __init__(self, source, formatter=None, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE, progress=None):
+        self.source = source
+        self.formatter = formatter or CsvFormatter()
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.stats = [Stats('source'), Stats('format'), Stats('sink')]
+
+    def run(self, sink):
+        source, format, _ = self.stats
+        chunk, rows, size = [], 0, 0
+        batches = batched(self.source, self.batch_size)
+        while True:
+            started = time.monotonic()
+            batch = next(batches, None)
+            source.add(len(batch or []), seconds=time.monotonic() - started)
+            if batch is None:
+                break
+
+            started = time.monotonic()
+            data = self.formatter(batch)
+            format.add(len(batch), len(data), time.monotonic() - started)
+
+            chunk.append(data)
+            rows += len(batch)
+            size += len(data)
+            if size >= self.chunk_size:
+                self.flush(sink, chunk, rows, size)
+                chunk, rows, size = [], 0, 0
+
+        close = getattr(self.formatter, 'close', None)  # trailing bytes of stateful formatters
+        if close:
+            started = time.monotonic()
+            data = close()
+            format.add(bytes=len(data), seconds=time.monotonic() - started)
+            chunk.append(data)
+            size += len(data)
+        if chunk:
+            self.flush(sink, chunk, rows, size)
+        self.log()
+        return self.stats
+
+    def flush(self, sink, chunk, rows, size):
+        started = time.monotonic()
+        sink.write(b''.join(chunk))
+        self.stats[2].add(rows, size, time.monotonic() - started)
+        if self.progress:
+            self.progress(self.stats[2].rows)
+
+    @property
+    def rows(self):
+        return self.stats[0].rows
+
+    @property
+    def bytes(self):
+        return self.stats[2].bytes
+
+    def log(self):
+        for stats in self.stats:
+            logger.info(str(stats))
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+
+from srt.core.events import publish
+from srt.core.models import TERMINAL
+
+
+class Progress:
+    """
+    Buffer status, msg and progress changes of a history row in memory and write them with one UPDATE at most
+    every interval seconds. The first change and terminal statuses are written right away. Every change is also
+    published right away to the event stream (srt.core.events), which is what live dashboards watch:
+
+      progress = history.tracker()
+      progress.update(status=STATUS.processing)
+      for i, day in enumerate(days):
+          progress.update(msg=f'generating {day}', progress=100 * i // len(days))  # coalesced
+      progress.update(status=STATUS.completed, progress=100)  # written with the pending changes
+    """
+
+    def __init__(self, instance, interval=None):
+        self.instance = instance
+        self.interval = settings.PROGRESS_FLUSH_INTERVAL if interval is None else interval
+        self.changes = {}
+        self.flushed = None
+        self.writes = 0
+
+    def update(self, **changes):
+        for key, value in changes.items():
+            setattr(self.instance, key, value)
+        self.changes.update(changes)
+        if changes.get('status') in TERMINAL or self.flushed is None or self.elapsed >= self.interval:
+            self.flush()
+        self.publish(**changes)
+
+    def publish(self, **data):
+        """ Publish data without writing it, e.g. row counts. """
+        publish(self.instance, **{'status': self.instance.status, 'progress': self.instance.progress, **data})
+
+    def flush(self):
+        if self.changes:
+            changes, self.changes = self.changes, {}
+            self.instance.modify(**changes)
+            self.writes += 1
+        self.flushed = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.flushed
@@ -0,0 +1,146 @@
+import os
+import datetime
+
+from django.db import connection, transaction
+
+from srt.core.formats import get_format
+from srt.core.helpers import get_logger
+from srt.core.pipeline import Pipeline
+
+logger = get_logger(__name__)
+
+FORMAT = 'jsonl.gz'
+
+
+def archive(model, cutoff, s3, batch_size):
+    """
+    Move the rows of model created before cutoff to s3, one jsonl.gz object per batch of batch_size rows walked by
+    id: a batch is deleted once its archive is uploaded. Keys are named after the id range, so a retried run
+    overwrites the same objects. Returns the number of rows archived.
+    """
+    format = get_format(FORMAT)
+    columns = [field.attname for field in model._meta.concrete_fields]
+    expired = model.objects.filter(created__lt=cutoff).order_by('id')
+    count = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return count
+        key = os.path.join('archive', model._meta.db_table, f'{ids[0]:012d}-{ids[-1]:012d}.{format.extension}')
+        rows = model.objects.filter(id__in=ids).order_by('id').values_list(*columns)
+        with s3.open(key, content_type=format.content_type, content_encoding=format.content_encoding) as file:
+            Pipeline(rows.iterator(), format.formatter(columns)).run(file)
+        with transaction.atomic():
+            model.objects.filter(id__in=ids).delete()
+        count += len(ids)
+        logger.info(f'archived {len(ids)} rows of {model._meta.db_table} to {key}')
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [table])
+        return cursor.fetchone()[0]
+
+
+def get_partitions(table):
+    """ Months of the monthly partitions of table, named {table}_pYYYYMM. """
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass AND c.relname LIKE %s ORDER BY c.relname
+        ''', [table, f'{table}\\_p%'])
+        return [datetime.datetime.strptime(name[-6:], '%Y%m').date() for name, in cursor.fetchall()]
+
+
+def add_months(month, months):
+    month = month.replace(day=1)
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def create_partitions(table, start, end):
+    """
+    Create the missing monthly partitions of table from the month of start to the month of end. Rows of a month
+    that landed in the default partition, while its partition was missing, are moved to the new partition.
+    """
+    existing = set(get_partitions(table))
+    month = start.replace(day=1)
+    while month <= end:
+        if month not in existing:
+            create_partition(table, month)
+        month = add_months(month, 1)
+
+
+def create_partition(table, month):
+    """ Create the partition of table for month, the default partition is detached while its rows are moved. """
+    default, name = f'{table}_default', f'{table}_p{month:%Y%m}'
+    bounds, where = [month, add_months(month, 1)], 'WHERE created >= %s AND created < %s'
+    moved = False
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [f'"{default}"'])
+        if cursor.fetchone()[0]:
+            cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{default}" {where})', bounds)
+            moved = cursor.fetchone()[0]
+        if moved:
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+        cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+                       f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')")
+        if moved:
+            cursor.execute(f'INSERT INTO "{name}" SELECT * FROM "{default}" {where}', bounds)
+            logger.info(f'moved {cursor.rowcount} rows of {default} to {name}')
+            cursor.execute(f'DELETE FROM "{default}" {where}', bounds)
+            cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+
+
+def drop_partitions(table, cutoff):
+    """ Drop the monthly partitions of table entirely before cutoff, once archive() emptied them. """
+    dropped = []
+    with connection.cursor() as cursor:
+        for month in get_partitions(table):
+            if add_months(month, 1) <= cutoff.date():
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{table}_p{month:%Y%m}")')
+                if not cursor.fetchone()[0]:
+                    cursor.execute(f'DROP TABLE "{table}_p{month:%Y%m}"')
+                    dropped.append(month)
+    return dropped
+
+
+def partition(table, months_ahead):
+    """
+    Convert table into monthly range partitions on created, plus a default partition. The table is locked while
+    its rows are copied, so run it in a maintenance window. The primary key becomes (id, created) as partitioned
+    tables require. Tables referenced by foreign keys cannot be partitioned before PostgreSQL 12.
+    """
+    old = f'{table}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM pg_constraint WHERE confrelid = %s::regclass', [table])
+        if cursor.fetchone()[0]:
+            raise ValueError(f'{table} is referenced by foreign keys and cannot be partitioned')
+        cursor.execute('''
+            SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN (
+                SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')
+        ''', [table, table])
+        indexes = [definition for definition, in cursor.fetchall()]
+        cursor.execute('''
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'
+        ''', [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min(created) FROM "{table}"')
+        start = (cursor.fetchone()[0] or datetime.datetime.now()).date()
+
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')  # check deferred foreign keys before the table is dropped
+        cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        cursor.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                       f'PARTITION BY RANGE (created)')
+        cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, created)')
+        cursor.execute(f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        create_partitions(table, start, add_months(datetime.date.today(), months_ahead))
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+        cursor.execute(f'DROP TABLE "{old}"')
+        for definition in indexes:  # read before the rename, so they name the partitioned table
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
@@ -0,0 +1,74 @@
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS, DatabaseError
+
+from srt.core.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+PRIMARY_APPS = ['reports', 'deliveries']  # bookkeeping (History, Delivery, ...) always reads its own writes
+
+_state = threading.local()
+_lags = {}
+
+
+@contextmanager
+def replica():
+    """ Route reads of the block (report data) to a replica, see get_read_alias. """
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def get_lag(alias):
+    """ Replication lag of alias in seconds, cached for DATABASE_REPLICA_LAG_CHECK seconds. """
+    checked, lag = _lags.get(alias, (0, None))
+    if time.monotonic() - checked < settings.DATABASE_REPLICA_LAG_CHECK:
+        return lag
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())')
+            lag = cursor.fetchone()[0] or 0.0  # NULL when alias is not replaying, e.g. mirrors the primary
+    except DatabaseError as e:
+        logger.warning(f'unable to check replication lag of {alias}: {e}')
+        lag = float('inf')
+    _lags[alias] = (time.monotonic(), float(lag))
+    return float(lag)
+
+
+def get_read_alias():
+    """ A replica lagging less than DATABASE_REPLICA_MAX_LAG seconds inside replica(), the primary otherwise. """
+    if not getattr(_state, 'replica', False):
+        return DEFAULT_DB_ALIAS
+    aliases = [alias for alias in settings.DATABASE_REPLICAS if get_lag(alias) <= settings.DATABASE_REPLICA_MAX_LAG]
+    return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+
+def get_sql_alias():
+    """ Read only companion of get_read_alias(), where sql written by users runs (see DATABASE_SQL_USER). """
+    return f'{get_read_alias()}_sql'
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return get_read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS and db not in settings.DATABASE_SQL_ALIASES
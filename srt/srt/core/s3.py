@@ -1,14 +1,211 @@
 import os
+import time
+import mimetypes
+import threading
 from io import BytesIO
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
-import magic
+try:
+    import magic
+except ImportError:
+    magic = None
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from srt.core.helpers import delimit
 
 
 S3_BASE_URL = 'https://%s.s3.amazonaws.com'
+PART_SIZE = 8 * 1024 * 1024  # 8 MB, s3 requires at least 5 MB for every part but the last one
+MAX_INFLIGHT = 4
+COPY_LIMIT = 5 * 1024 ** 3  # 5 GB, largest object copy_object accepts
+COPY_PART_SIZE = 512 * 1024 ** 2  # 512 MB, keeps a 5 TB object under the 10000 parts limit
+MAX_POOL_CONNECTIONS = 32
+DOWNLOAD_WORKERS = 1
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+READ_SIZE = 1024 * 1024  # 1 MB
+IDLE_TIMEOUT = 300  # 5 minutes
+SNIFF_SIZE = 2048  # bytes libmagic needs to tell most types apart
+DEFAULT_MIMETYPE = 'binary/octet-stream'
+MIMETYPES = {
+    '.csv': 'text/csv',
+    '.jsonl': 'application/x-ndjson',
+    '.parquet': 'application/vnd.apache.parquet',
+    '.gz': 'application/gzip',
+    '.zst': 'application/zstd',
+}
+
+
+@lru_cache(maxsize=1024)
+def guess_mimetype(name):
+    """ Mimetype from the file extension, None when unknown. """
+    _, extension = os.path.splitext(name.lower())
+    return MIMETYPES.get(extension) or mimetypes.guess_type(name, strict=False)[0]
+
+
+class ClientCache:
+    """
+    Process-wide cache of boto3 clients keyed by credentials and region, so tasks reuse endpoint resolution and
+    pooled (already TLS-handshaked) connections instead of building a client per S3 instance. Clients unused for
+    idle_timeout seconds are evicted, and the cache is emptied in forked children (celery prefork workers) since
+    connections must not be shared across processes.
+    """
+
+    def __init__(self, max_pool_connections=MAX_POOL_CONNECTIONS, idle_timeout=IDLE_TIMEOUT):
+        self.max_pool_connections = max_pool_connections
+        self.idle_timeout = idle_timeout
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.pid = os.getpid()
+
+    def get(self, key, secret, region):
+        if self.pid != os.getpid():
+            self.reset()
+        with self.lock:
+            self.evict()
+            cache_key = (key, secret, region)
+            client = self.clients[cache_key][0] if cache_key in self.clients else self.create(key, secret, region)
+            self.clients[cache_key] = (client, time.monotonic())
+            return client
+
+    def create(self, key, secret, region):
+        session = boto3.session.Session()  # the default session is not thread-safe
+        return session.client('s3',
+            aws_access_key_id=key,
+            aws_secret_access_key=secret,
+            region_name=region,
+            use_ssl=True,
+            config=Config(max_pool_connections=self.max_pool_connections))
+
+    def evict(self):
+        expired = time.monotonic() - self.idle_timeout
+        for cache_key, (_, used) in list(self.clients.items()):
+            if used < expired:
+                del self.clients[cache_key]
+
+    def clear(self):
+        with self.lock:
+            self.clients = {}
+
+
+clients = ClientCache()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=clients.reset)
+
+
+class S3Writer:
+    """
+    Writable file-like object which streams its content to s3 as a multipart upload. Parts of part_size bytes
+    are uploaded in background threads, at most max_inflight of them at once, so memory is bounded by
+    part_size * (max_inflight + 1). Content smaller than one part is sent with a single put_object.
+
+    Used as a context manager the upload is completed on success and aborted on any exception:
+
+      with s3.open('myfile.csv') as file:
+          file.write(b'...')
+    """
+
+    def __init__(self, client, bucket, key, params=None, part_size=PART_SIZE, max_inflight=MAX_INFLIGHT):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.params = params or {}
+        self.part_size = part_size
+        self.max_inflight = max_inflight
+        self.upload_id = None
+        self.buffer = bytearray()
+        self.futures = []
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.position = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        self.buffer.extend(data)
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self.submit(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def submit(self, part):
+        if not self.upload_id:
+            response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.params)
+            self.upload_id = response['UploadId']
+            self.executor = ThreadPoolExecutor(max_workers=self.max_inflight)
+        for future in self.futures:
+            if future.done() and future.exception():
+                raise future.exception()
+        self.slots.acquire()
+        number = len(self.futures) + 1
+        future = self.executor.submit(self.upload_part, number, part)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+
+    def upload_part(self, number, part):
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=number, Body=part)
+        return {'ETag': response['ETag'], 'PartNumber': number}
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self.upload_id:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), **self.params)
+            else:
+                if self.buffer:
+                    self.submit(bytes(self.buffer))
+                parts = [future.result() for future in self.futures]
+                self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                    MultipartUpload={'Parts': parts})
+        except Exception:
+            self.abort()
+            raise
+        self.shutdown()
+
+    def abort(self):
+        if self.closed:
+            return
+        for future in self.futures:
+            future.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        if self.upload_id:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        self.shutdown()
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self.buffer = bytearray()
+        self.closed = True
 
 
 class S3:
@@ -31,11 +228,7 @@ class S3:
 
     def connect(self):
         if not self.client:
-            self.client = boto3.client('s3',
-                aws_access_key_id=self.key,
-                aws_secret_access_key=self.secret,
-                region_name=self.region,
-                use_ssl=True)
+            self.client = clients.get(self.key, self.secret, self.region)
 
     def list(self, remote=None, include_dirs=True, include_files=True, delimiter='/'):
         self.connect()
@@ -73,7 +266,7 @@ class S3:
 
         # prepare
         remote = self.get_remote(remote or os.path.basename(src))
-        content_type = content_type or self.get_mimetype(src)
+        content_type = self.get_mimetype(src, remote, content_type)
         if hasattr(src, 'seek'):
             needs_closing = False
         elif isinstance(src, bytes):
@@ -87,22 +280,63 @@ class S3:
             raise Exception('Unexpected input type: %s' % type(src))
 
         # upload
-        params = {
-            'ACL': 'public-read' if public else 'private',
-            'ContentType': content_type,
-        }
-        if download_filename:
-            params['ContentDisposition'] = 'attachment; filename="%s"' % download_filename
+        params = self.get_params(public, content_type, download_filename)
         try:
             self.client.upload_fileobj(src, self.bucket, remote, ExtraArgs=params)
         finally:
             if needs_closing:
                 src.close()
 
-    def download(self, local, remote=None):
+    def open(self, remote, public=False, content_type=None, download_filename=None, content_encoding=None,
+             part_size=PART_SIZE, max_inflight=MAX_INFLIGHT):
+        """ Open remote for writing, see S3Writer. """
+        self.connect()
+        remote = self.get_remote(remote)
+        params = self.get_params(public, self.get_mimetype(None, remote, content_type), download_filename,
+            content_encoding)
+        return S3Writer(self.client, self.bucket, remote, params, part_size=part_size, max_inflight=max_inflight)
+
+    def download(self, local, remote=None, workers=DOWNLOAD_WORKERS, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        With more than one worker the object is fetched as chunk_size byte ranges in parallel threads, each one
+        written at its offset into a preallocated local file.
+        """
         self.connect()
         remote = self.get_remote(remote or os.path.basename(local))
-        self.client.download_file(Bucket=self.bucket, Key=remote, Filename=local)
+        if workers <= 1:
+            self.client.download_file(Bucket=self.bucket, Key=remote, Filename=local)
+            return
+
+        metadata = self.client.head_object(Bucket=self.bucket, Key=remote)
+        size, etag = metadata['ContentLength'], metadata['ETag']
+        with open(local, 'wb') as file:
+            file.truncate(size)
+        fd = os.open(local, os.O_WRONLY)
+
+        def fetch(start):
+            end = min(start + chunk_size, size) - 1
+            response = self.client.get_object(Bucket=self.bucket, Key=remote, Range=f'bytes={start}-{end}',
+                IfMatch=etag)  # fail instead of mixing ranges of two versions
+            offset = start
+            for data in iter(lambda: response['Body'].read(READ_SIZE), b''):
+                os.pwrite(fd, data, offset)
+                offset += len(data)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(fetch, range(0, size, chunk_size)))
+        finally:
+            os.close(fd)
+
+    def stream(self, remote=None, chunk_size=READ_SIZE):
+        """ Iterate over the content of remote in chunks of chunk_size bytes. """
+        self.connect()
+        remote = self.get_remote(remote)
+        body = self.client.get_object(Bucket=self.bucket, Key=remote)['Body']
+        try:
+            yield from iter(lambda: body.read(chunk_size), b'')
+        finally:
+            body.close()
 
     def download_object(self, remote=None):
         self.connect()
@@ -111,6 +345,35 @@ class S3:
         self.client.download_fileobj(Bucket=self.bucket, Key=remote, Fileobj=temp)
         return temp.getvalue()
 
+    def copy(self, source_bucket, source_key, remote=None, part_size=COPY_PART_SIZE):
+        """
+        Server-side copy of s3://source_bucket/source_key to remote, bytes never leave s3. Objects above
+        COPY_LIMIT are copied as a multipart upload of part_size ranges.
+        """
+        self.connect()
+        remote = self.get_remote(remote or os.path.basename(source_key))
+        source = {'Bucket': source_bucket, 'Key': source_key}
+        metadata = self.client.head_object(**source)
+        size = metadata['ContentLength']
+        if size <= COPY_LIMIT:
+            self.client.copy_object(CopySource=source, Bucket=self.bucket, Key=remote)
+            return
+
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=remote,
+            ContentType=metadata.get('ContentType', 'binary/octet-stream'))
+        params = {'Bucket': self.bucket, 'Key': remote, 'UploadId': upload['UploadId']}
+        try:
+            parts = []
+            for number, start in enumerate(range(0, size, part_size), 1):
+                end = min(start + part_size, size) - 1
+                response = self.client.upload_part_copy(CopySource=source, CopySourceRange=f'bytes={start}-{end}',
+                    PartNumber=number, **params)
+                parts.append({'ETag': response['CopyPartResult']['ETag'], 'PartNumber': number})
+            self.client.complete_multipart_upload(MultipartUpload={'Parts': parts}, **params)
+        except Exception:
+            self.client.abort_multipart_upload(**params)
+            raise
+
     def last_modified(self, remote):
         self.connect()
         remote = self.get_remote(remote)
@@ -129,15 +392,43 @@ class S3:
         remote = self.get_remote(remote)
         self.client.delete_object(Bucket=self.bucket, Key=remote)
 
-    def get_mimetype(self, src):
+    def get_params(self, public=False, content_type=None, download_filename=None, content_encoding=None):
+        params = {
+            'ACL': 'public-read' if public else 'private',
+            'ContentType': content_type,
+        }
+        if download_filename:
+            params['ContentDisposition'] = 'attachment; filename="%s"' % download_filename
+        if content_encoding:
+            params['ContentEncoding'] = content_encoding
+        return params
+
+    def get_mimetype(self, src, remote=None, content_type=None):
+        """
+        Resolve the mimetype of src: an explicit content_type wins, then the extension of the local path or
+        remote key. libmagic is only a fallback for unknown extensions, when it is installed.
+        """
+        if content_type:
+            return content_type
+        path = isinstance(src, str) and os.path.exists(src)
+        for name in [src if path else None, remote]:
+            mimetype = guess_mimetype(name) if name else None
+            if mimetype:
+                return mimetype
+        if isinstance(src, str) and not path:
+            return 'text/plain'  # string content
+        if not magic:
+            return DEFAULT_MIMETYPE
         if isinstance(src, str):
-            try:
-                mimetype = magic.from_file(src, mime=True)
-            except FileNotFoundError:
-                mimetype = 'text/plain'
-        else:
-            mimetype = magic.from_buffer(src, mime=True)
-        return mimetype
+            return magic.from_file(src, mime=True)
+        if isinstance(src, bytes):
+            return magic.from_buffer(src[:SNIFF_SIZE], mime=True)
+        if hasattr(src, 'read') and hasattr(src, 'seek'):
+            position = src.tell()
+            head = src.read(SNIFF_SIZE)
+            src.seek(position)
+            return magic.from_buffer(head, mime=True)
+        return DEFAULT_MIMETYPE
 
     def get_remote(self, path):
         if not path:
@@ -0,0 +1,56 @@
+import datetime
+
+from celery import Task
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+from srt.core.manage import register
+from srt.core.s3 import S3
+from srt.core.helpers import get_logger
+from srt.core.retention import archive, is_partitioned, create_partitions, drop_partitions, add_months
+
+logger = get_logger(__name__)
+
+
+@register()
+class Retention(Task):
+    """
+    Archive report and delivery histories older than HISTORY_RETENTION_DAYS to s3 and delete them, run daily by
+    celery beat. Delivery histories go first since they point to report histories. Partitioned tables (see the
+    partition_history command) also get their next months created and their emptied months dropped. A failure is
+    logged and does not stop the other steps, the next run retries it.
+    """
+    abstract = False
+    models = ['deliveries.History', 'reports.History']
+
+    def run(self, days=None, *args, **kwargs):
+        days = settings.HISTORY_RETENTION_DAYS if days is None else days
+        if not days:
+            return {}
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        s3 = S3(settings.AWS_KEY, settings.AWS_SECRET, settings.AWS_BUCKET, settings.ENV)
+        archived = {}
+        for label in self.models:
+            model = apps.get_model(label)
+            try:
+                archived[label] = archive(model, cutoff, s3, settings.HISTORY_RETENTION_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f'unable to archive {label}: {e}')
+            try:
+                self.partition(model._meta.db_table, cutoff)
+            except Exception as e:
+                logger.error(f'unable to maintain the partitions of {label}: {e}')
+        logger.info(f'archived histories created before {cutoff}: {archived}')
+        return archived
+
+    def partition(self, table, cutoff):
+        if is_partitioned(table):
+            today = timezone.now().date()
+            create_partitions(table, today, add_months(today, settings.HISTORY_PARTITIONS_AHEAD))
+            drop_partitions(table, cutoff)
+
+
+if __name__ == '__main__':
+    job = Retention()
+    job.run()
@@ -1,10 +1,29 @@
+import os
+import unittest
+
 from faker import Faker
+from django.db import connection
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
 
 EXCLUDE = ['password']
 
+benchmark = unittest.skipUnless(os.environ.get('BENCHMARKS'), 'set BENCHMARKS=1 to run benchmarks')
+
+
+def assert_index_scan(queryset, index):
+    """ Fail when the plan of queryset falls back to a sequential scan instead of using index. """
+    plan = queryset.explain()
+    assert 'Seq Scan' not in plan and index in plan, plan
+
+
+def run_on_commit():
+    """ Run transaction.on_commit callbacks, TestCase never commits. """
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
+
 
 class BaseTestCase(APITestCase):
     list_url = None
@@ -0,0 +1,58 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from srt.deliveries.tests.factories import TargetFactory, DeliveryFactory, HistoryFactory as DeliveryHistoryFactory
+from srt.reports.tests.factories import ReportFactory, HistoryFactory
+from srt.users.tests.factories import StaffUserFactory, UserFactory
+
+
+class ChangelistQueriesTestCase(TestCase):
+    """ Changelists run the same number of queries whatever the number of rows they render. """
+
+    def setUp(self):
+        self.client.force_login(StaffUserFactory())
+
+    def assert_constant_queries(self, name, create):
+        url = reverse(f'admin:{name}_changelist')
+        counts = []
+        for rows in [1, 20]:
+            for _ in range(rows):
+                create()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            assert response.status_code == 200
+            counts.append(len(queries))
+        assert counts[0] == counts[1], f'{name}: {counts[0]} queries for 1 row, {counts[1]} for 21'
+
+    def test_users(self):
+        self.assert_constant_queries('users_user', UserFactory)
+
+    def test_reports(self):
+        self.assert_constant_queries('reports_report', ReportFactory)
+
+    def test_report_histories(self):
+        self.assert_constant_queries('reports_history', HistoryFactory)
+
+    def test_targets(self):
+        def create():
+            DeliveryFactory(target=TargetFactory())
+        self.assert_constant_queries('deliveries_target', create)
+
+    def test_deliveries(self):
+        def create():
+            DeliveryHistoryFactory(delivery=DeliveryFactory())
+        self.assert_constant_queries('deliveries_delivery', create)
+
+    def test_delivery_histories(self):
+        self.assert_constant_queries('deliveries_history', DeliveryHistoryFactory)
+
+    def test_delivery_counts(self):
+        target = TargetFactory()
+        delivery = DeliveryFactory(target=target)
+        DeliveryHistoryFactory.create_batch(3, delivery=delivery)
+        content = self.client.get(reverse('admin:deliveries_delivery_changelist')).content.decode()
+        assert '3 delivered' in content
+        content = self.client.get(reverse('admin:deliveries_target_changelist')).content.decode()
+        assert '1 delivery' in content
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+from celery import Task
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from srt.core.db import stats, checkout, release
+from srt.core.manage import register
+
+
+@register()
+class Query(Task):
+    abstract = False
+
+    def run(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+class PoolTestCase(SimpleTestCase):
+    allow_database_queries = True
+
+    def setUp(self):
+        connection.close()
+        connection.last_released = 0  # idle since ever
+        stats.reset()
+
+    def test_checkout__reuses_healthy_connection(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        for _ in range(3):
+            checkout()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            release()
+        assert connection.connection is raw
+        assert stats.as_dict()['checkouts'] == 3
+        assert stats.connects == 1 and stats.reconnects == 0
+
+    def test_checkout__drops_broken_connection(self):
+        connection.ensure_connection()
+        connection.connection.close()  # e.g. killed by the server or a pooler restart
+        checkout()
+        assert connection.connection is None
+        connection.ensure_connection()
+        assert stats.reconnects == 1
+
+    def test_checkout__only_checks_idle_connections(self):
+        connection.ensure_connection()
+        with patch.object(connection, 'is_usable', wraps=connection.is_usable) as is_usable:
+            checkout()  # never released yet
+            release()
+            checkout()
+            assert is_usable.call_count == 1
+            with override_settings(DATABASE_HEALTH_CHECK_IDLE=0):
+                checkout()
+            assert is_usable.call_count == 2
+        assert stats.checkouts == 3 and stats.health_checks == 2
+
+    def test_signals__requests(self):
+        connection.ensure_connection()
+        self.client.get('/api/v1/events/')
+        self.client.get('/api/v1/events/')
+        assert stats.checkouts == 2 and stats.health_checks == 1
+        assert connection.last_released
+
+    def test_signals__tasks(self):
+        Query().apply()
+        Query().apply()
+        assert stats.checkouts == 2 and stats.connects == 1
+
+    @override_settings(DATABASE_STATS_INTERVAL=0)
+    def test_checkout__logs_stats(self):
+        with self.assertLogs('srt.core.db', 'INFO') as logs:
+            checkout()
+        assert logs.output == ["INFO:srt.core.db:database connections: {'checkouts': 1, 'health_checks': 0, "
+                               "'health_check_seconds': 0.0, 'connects': 0, 'reconnects': 0}"]
@@ -0,0 +1,129 @@
+import json
+from itertools import islice
+from unittest.mock import patch
+
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED, \
+    HTTP_429_TOO_MANY_REQUESTS
+
+from srt.core.events import Stream, subscribe, stream, format_event
+from srt.core.models import STATUS
+from srt.core.tests import BaseTestCase
+from srt.reports.tests.factories import HistoryFactory
+from srt.users.tests.factories import UserFactory
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.messages = []
+        self.channels = []
+        self.received = []
+
+    def publish(self, channel, message):
+        message = {'channel': channel, 'data': message.encode()}
+        self.messages.append(message)
+        if channel in self.channels:  # like redis, nobody receives what is published before subscribing
+            self.received.append(message)
+
+    def pubsub(self, **kw):
+        return self
+
+    def subscribe(self, *channels):
+        self.channels += channels
+
+    def get_message(self, timeout):
+        return self.received.pop(0) if self.received else None
+
+    def close(self):
+        pass
+
+
+class EventsTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patchers = [patch('srt.core.events.get_redis', return_value=self.redis), patch('srt.core.events._failed', None),
+                    patch.object(Stream, 'opened', 0)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_tracker__publishes_every_change(self):
+        history = HistoryFactory()
+        progress = history.tracker(interval=60)
+        progress.update(status=STATUS.processing)
+        progress.publish(rows=10000)
+        events = [json.loads(message['data']) for message in self.redis.messages]
+        assert events == [
+            {'type': 'reports', 'id': history.id, 'status': 'processing', 'progress': 0},
+            {'type': 'reports', 'id': history.id, 'status': 'processing', 'progress': 0, 'rows': 10000},
+        ]
+        assert self.redis.messages[0]['channel'] == 'srt:events:reports'
+
+    def test_stream__filters_ids_until_done(self):
+        watched, other = HistoryFactory(), HistoryFactory()
+        pubsub = subscribe(['reports'])
+        other.tracker().update(status=STATUS.processing)
+        watched.tracker().update(status=STATUS.processing)
+        watched.tracker().update(status=STATUS.completed, progress=100)
+        events = list(stream(pubsub, {watched.id}, heartbeat=0))
+        assert self.redis.channels == ['srt:events:reports']
+        assert len(events) == 2
+        assert events[1].startswith('event: reports\ndata: ') and '"status": "completed"' in events[1]
+
+    def test_stream__ends_after_max_age(self):
+        history = HistoryFactory()
+        assert list(stream(subscribe(['reports']), {history.id}, heartbeat=0, max_age=0)) == []
+
+    @override_settings(EVENTS_MAX_STREAMS=1)
+    def test_get__streams_per_process(self):
+        url = reverse('events') + f'?type=reports&ids={HistoryFactory().id}'
+        self.client.force_authenticate(UserFactory())
+        response = self.client.get(url)
+        assert response.status_code == HTTP_200_OK and Stream.opened == 1
+        assert self.client.get(url).status_code == HTTP_429_TOO_MANY_REQUESTS
+        self.close(response)  # never read, the client went away
+        assert Stream.opened == 0
+        assert self.client.get(url).status_code == HTTP_200_OK
+
+    def close(self, response):
+        """ Close response like the server does, without closing the connection of the test transaction. """
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+
+    def test_get__snapshot_of_finished_histories(self):
+        history = HistoryFactory(status=STATUS.completed, progress=100)
+        url = reverse('events') + f'?type=reports&ids={history.id}'
+        assert self.client.get(url).status_code == HTTP_401_UNAUTHORIZED
+        self.client.force_authenticate(UserFactory())
+        response = self.client.get(url)
+        assert response.status_code == HTTP_200_OK
+        assert response['Content-Type'] == 'text/event-stream'
+        content = b''.join(response.streaming_content).decode()
+        assert content == f'event: reports\ndata: {{"type": "reports", "id": {history.id}, "status": "completed", ' \
+                          f'"progress": 100}}\n\n'
+        assert self.client.get(reverse('events') + '?type=reports,deliveries&ids=1').status_code == \
+            HTTP_400_BAD_REQUEST
+        assert self.client.get(reverse('events') + '?type=reports').status_code == HTTP_400_BAD_REQUEST
+
+    @override_settings(EVENTS_HEARTBEAT=0)
+    def test_get__changes_made_while_the_snapshot_is_read(self):
+        history = HistoryFactory(status=STATUS.processing)
+
+        def complete(event):
+            history.tracker().update(status=STATUS.completed, progress=100)
+            return format_event(event)
+
+        self.client.force_authenticate(UserFactory())
+        with patch('srt.core.views.format_event', side_effect=complete):
+            response = self.client.get(reverse('events') + f'?type=reports&ids={history.id}')
+        events = list(islice(response.streaming_content, 3))
+        assert len(events) == 2
+        assert b'"status": "completed"' in events[1]
@@ -0,0 +1,59 @@
+import io
+import gzip
+import json
+
+from django.test import SimpleTestCase
+
+from srt.core.formats import get_format, pyarrow, zstandard
+from srt.core.pipeline import Pipeline
+
+
+ROWS = [[i, f'name {i}', i * 1.5] for i in range(250)]
+COLUMNS = ['id', 'name', 'value']
+
+
+def run(name, columns=None, rows=ROWS):
+    sink = io.BytesIO()
+    Pipeline(iter(rows), get_format(name).formatter(columns), batch_size=100, chunk_size=64).run(sink)
+    return sink.getvalue()
+
+
+class FormatTestCase(SimpleTestCase):
+
+    def test_get_format(self):
+        assert get_format().name == 'csv'
+        assert get_format('csv.gz').content_encoding == 'gzip'
+        with self.assertRaises(ValueError):
+            get_format('xls')
+
+    def test_csv__header(self):
+        lines = run('csv', COLUMNS).decode().splitlines()
+        assert lines[0] == 'id,name,value'
+        assert len(lines) == 251
+
+    def test_csv__header_without_rows(self):
+        assert run('csv', COLUMNS, rows=[]) == b'id,name,value\r\n'
+        assert gzip.decompress(run('csv.gz', COLUMNS, rows=[])) == b'id,name,value\r\n'
+
+    def test_csv_gz(self):
+        assert gzip.decompress(run('csv.gz')) == run('csv')
+
+    def test_jsonl(self):
+        lines = run('jsonl.gz', COLUMNS)
+        rows = [json.loads(line) for line in gzip.decompress(lines).decode().splitlines()]
+        assert rows[1] == {'id': 1, 'name': 'name 1', 'value': 1.5}
+
+    def test_csv_zst(self):
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(run('csv.zst')) == run('csv')
+
+    def test_parquet__row_groups(self):
+        import pyarrow.parquet
+        file = pyarrow.parquet.ParquetFile(io.BytesIO(run('parquet', COLUMNS)))
+        assert file.metadata.num_row_groups == 3
+        assert file.read().to_pydict()['name'][249] == 'name 249'
+
+    def test_parquet__schema_without_rows(self):
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(io.BytesIO(run('parquet', COLUMNS, rows=[])))
+        assert table.column_names == COLUMNS
+        assert table.num_rows == 0
@@ -0,0 +1,38 @@
+import unittest
+
+import redis
+from django.test import SimpleTestCase
+
+from srt.core.locks import Lease, get_redis
+
+
+def redis_available():
+    try:
+        return get_redis().ping()
+    except redis.RedisError:
+        return False
+
+
+@unittest.skipUnless(redis_available(), 'redis is not reachable')
+class LeaseTestCase(SimpleTestCase):
+
+    def test_acquire__single_holder(self):
+        lease, other = Lease('test', 1, ttl=1), Lease('test', 2, ttl=1)
+        assert lease.acquire()
+        try:
+            assert not other.acquire()
+            assert other.holder() == '1'
+            assert not other.release()  # only the holder releases
+        finally:
+            assert lease.release()
+        assert other.acquire()
+        other.release()
+
+    def test_token__hands_the_lease_over(self):
+        lease = Lease('test', 1, ttl=1)
+        assert lease.acquire()
+        lease.stop()
+        other = Lease('test', token=lease.token)
+        assert other.extend(ttl=5)
+        assert Lease('test', 2).holder() == '1'
+        assert other.release()
@@ -0,0 +1,26 @@
+import io
+
+from django.test import SimpleTestCase
+
+from srt.core.pipeline import Pipeline, batched
+
+
+class PipelineTestCase(SimpleTestCase):
+
+    def test_batched(self):
+        assert [len(batch) for batch in batched(range(25), 10)] == [10, 10, 5]
+
+    def test_run__writes_csv_in_chunks(self):
+        sink = io.BytesIO()
+        writes = []
+        sink.write = lambda data, write=sink.write: writes.append(len(data)) or write(data)
+        rows = ([i, f'name {i}', 'a,b'] for i in range(1000))
+        pipeline = Pipeline(rows, batch_size=100, chunk_size=1024)
+        pipeline.run(sink)
+        lines = sink.getvalue().decode().splitlines()
+        assert len(lines) == 1000
+        assert lines[1] == '1,name 1,"a,b"'
+        assert len(writes) > 1 and all(size >= 1024 for size in writes[:-1])
+        assert pipeline.rows == 1000
+        assert pipeline.bytes == len(sink.getvalue())
+        assert [stats.rows for stats in pipeline.stats] == [1000, 1000, 1000]
@@ -0,0 +1,31 @@
+from django.test import TestCase
+
+from srt.core.models import STATUS
+from srt.reports.tests.factories import HistoryFactory
+
+
+class ProgressTestCase(TestCase):
+
+    def test_update__coalesces_writes_until_terminal_status(self):
+        history = HistoryFactory()
+        progress = history.tracker(interval=60)
+        with self.assertNumQueries(1):
+            progress.update(status=STATUS.processing)
+            for percent in range(100):
+                progress.update(msg=f'row {percent}', progress=percent)
+        history.refresh_from_db()
+        assert (history.status, history.progress) == (STATUS.processing, 0)
+
+        with self.assertNumQueries(1):
+            progress.update(status=STATUS.completed, progress=100)
+        history.refresh_from_db()
+        assert (history.status, history.msg, history.progress) == (STATUS.completed, 'row 99', 100)
+        assert progress.writes == 2
+
+    def test_update__writes_every_interval(self):
+        history = HistoryFactory()
+        progress = history.tracker(interval=0)
+        with self.assertNumQueries(3):
+            for percent in [10, 20, 30]:
+                progress.update(progress=percent)
+        assert history.tracker() is progress
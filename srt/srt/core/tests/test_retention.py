@@ -0,0 +1,83 @@
+import gzip
+import json
+import datetime
+from unittest.mock import patch
+
+from django.core.management import call_command, CommandError
+from django.db import connection, DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from srt.core.retention import is_partitioned, get_partitions, add_months, create_partitions
+from srt.core.tasks import Retention
+from srt.deliveries.models import History as DeliveryHistory
+from srt.deliveries.tests.factories import HistoryFactory as DeliveryHistoryFactory
+from srt.reports.models import History
+from srt.reports.tests.test_tasks import FakeS3
+
+
+@patch('srt.core.tasks.S3', FakeS3)
+class RetentionTestCase(TestCase):
+
+    def setUp(self):
+        FakeS3.objects = {}
+        self.old = DeliveryHistoryFactory.create_batch(3)
+        self.new = DeliveryHistoryFactory()
+        ids = [history.id for history in self.old]
+        DeliveryHistory.objects.filter(id__in=ids).update(created=timezone.now() - datetime.timedelta(days=100))
+        History.objects.filter(id__in=[h.history_id for h in self.old]).update(
+            created=timezone.now() - datetime.timedelta(days=100))
+
+    @patch('srt.core.tasks.settings.HISTORY_RETENTION_BATCH_SIZE', 2)
+    def test_run__archives_and_deletes_in_batches(self):
+        assert Retention().run(days=30) == {'deliveries.History': 3, 'reports.History': 3}
+        assert list(DeliveryHistory.objects.all()) == [self.new]
+        assert list(History.objects.all()) == [self.new.history]
+        assert sorted(FakeS3.objects) == [
+            f'archive/deliveries_history/{self.old[0].id:012d}-{self.old[1].id:012d}.jsonl.gz',
+            f'archive/deliveries_history/{self.old[2].id:012d}-{self.old[2].id:012d}.jsonl.gz',
+            f'archive/reports_history/{self.old[0].history_id:012d}-{self.old[1].history_id:012d}.jsonl.gz',
+            f'archive/reports_history/{self.old[2].history_id:012d}-{self.old[2].history_id:012d}.jsonl.gz',
+        ]
+        rows = [json.loads(line) for key in sorted(FakeS3.objects) if 'deliveries' in key
+                for line in gzip.decompress(FakeS3.objects[key]).decode().splitlines()]
+        assert [(row['id'], row['delivery_id']) for row in rows] == [(h.id, h.delivery_id) for h in self.old]
+        assert Retention().run(days=30) == {'deliveries.History': 0, 'reports.History': 0}
+
+    def test_partition_history__monthly_partitions(self):
+        call_command('partition_history')
+        assert is_partitioned('deliveries_history')
+        months = get_partitions('deliveries_history')
+        today = timezone.now().date()
+        assert months[0] == add_months(today - datetime.timedelta(days=100), 0)
+        assert months[-1] == add_months(today, 3)
+        assert DeliveryHistory.objects.count() == 4
+        DeliveryHistoryFactory()
+
+        Retention().run(days=30)
+        assert DeliveryHistory.objects.count() == 2
+        assert get_partitions('deliveries_history')[0] > months[0]
+        with self.assertRaises(CommandError):
+            call_command('partition_history', 'reports_history')
+
+    def test_create_partitions__moves_rows_out_of_the_default_partition(self):
+        call_command('partition_history')
+        month = add_months(timezone.now().date(), 6)  # past the months created ahead
+        missed = DeliveryHistoryFactory()
+        created = datetime.datetime(month.year, month.month, 2, tzinfo=timezone.utc)
+        DeliveryHistory.objects.filter(id=missed.id).update(created=created)
+        create_partitions('deliveries_history', month, month)
+        assert get_partitions('deliveries_history')[-1] == month
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM "deliveries_history_p{month:%Y%m}"')
+            assert cursor.fetchall() == [(missed.id,)]
+            cursor.execute('SELECT count(*) FROM deliveries_history_default')
+            assert cursor.fetchone() == (0,)
+        assert DeliveryHistory.objects.count() == 5
+
+    @patch('srt.core.tasks.create_partitions', side_effect=DatabaseError('no partition'))
+    @patch('srt.core.tasks.archive', side_effect=[DatabaseError('no s3'), 3])
+    def test_run__failures_do_not_stop_other_models(self, archive, create_partitions):
+        call_command('partition_history')
+        assert Retention().run(days=30) == {'reports.History': 3}
+        assert archive.call_count == 2
@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from srt.core import routers
+from srt.core.routers import ReplicaRouter, replica, get_read_alias
+from srt.reports.models import History
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], DATABASE_REPLICA_MAX_LAG=30)
+class ReplicaRouterTestCase(TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.lags = {'replica1': 1.0, 'replica2': 60.0}
+        patcher = mock.patch.object(routers, 'get_lag', side_effect=self.lags.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_db_for_read__replica_only_inside_block(self):
+        user = get_user_model()
+        assert self.router.db_for_read(user) == 'default'
+        with replica():
+            assert self.router.db_for_read(user) == 'replica1'
+            assert self.router.db_for_read(History) == 'default'
+        assert self.router.db_for_read(user) == 'default'
+        assert self.router.db_for_write(user) == 'default'
+
+    def test_get_read_alias__falls_back_to_primary_when_replicas_lag(self):
+        self.lags['replica1'] = float('inf')
+        with replica():
+            assert get_read_alias() == 'default'
+
+    def test_allow_migrate__primary_only(self):
+        assert self.router.allow_migrate('default', 'reports')
+        assert not self.router.allow_migrate('replica1', 'reports')
+
+
+class LagTestCase(TestCase):
+
+    def test_get_lag__primary_is_not_lagging(self):
+        routers._lags.clear()
+        assert routers.get_lag('default') == 0.0
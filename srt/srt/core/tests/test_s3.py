@@ -0,0 +1,205 @@
+import os
+import time
+import tempfile
+import unittest
+from io import BytesIO
+
+import boto3
+from django.test import SimpleTestCase
+
+from srt.core.s3 import S3, S3Writer, ClientCache, clients, guess_mimetype, magic
+from srt.core.tests import benchmark
+
+
+class FakeClient:
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.calls = []
+        self.parts = {}
+
+    def create_multipart_upload(self, **kw):
+        self.calls.append('create_multipart_upload')
+        return {'UploadId': 'upload'}
+
+    def upload_part(self, PartNumber, Body, **kw):
+        if PartNumber == self.fail_part:
+            raise IOError('part failed')
+        self.parts[PartNumber] = Body
+        return {'ETag': f'etag{PartNumber}'}
+
+    def complete_multipart_upload(self, MultipartUpload, **kw):
+        self.calls.append('complete_multipart_upload')
+        self.completed = MultipartUpload['Parts']
+
+    def abort_multipart_upload(self, **kw):
+        self.calls.append('abort_multipart_upload')
+
+    def put_object(self, Body, **kw):
+        self.calls.append('put_object')
+        self.body = Body
+
+    def head_object(self, **kw):
+        return {'ContentLength': self.size, 'ContentType': 'text/csv', 'ETag': 'etag'}
+
+    def get_object(self, Range, IfMatch, **kw):
+        start, end = map(int, Range.replace('bytes=', '').split('-'))
+        self.calls.append(Range)
+        return {'Body': BytesIO(self.data[start:end + 1])}
+
+    def copy_object(self, **kw):
+        self.calls.append('copy_object')
+
+    def upload_part_copy(self, PartNumber, CopySourceRange, **kw):
+        self.parts[PartNumber] = CopySourceRange
+        return {'CopyPartResult': {'ETag': f'etag{PartNumber}'}}
+
+
+class S3WriterTestCase(SimpleTestCase):
+
+    def test_write__small_content_uses_put_object(self):
+        client = FakeClient()
+        with S3Writer(client, 'bucket', 'key', part_size=10) as file:
+            file.write(b'12345')
+        assert client.calls == ['put_object']
+        assert client.body == b'12345'
+
+    def test_write__uploads_parts_in_order(self):
+        client = FakeClient()
+        with S3Writer(client, 'bucket', 'key', part_size=10, max_inflight=2) as file:
+            for i in range(7):
+                file.write(b'abcd')
+        assert client.calls == ['create_multipart_upload', 'complete_multipart_upload']
+        assert [part['PartNumber'] for part in client.completed] == [1, 2, 3]
+        assert b''.join(client.parts[i] for i in [1, 2, 3]) == b'abcd' * 7
+        assert file.tell() == 28
+
+    def test_write__failure_aborts_upload(self):
+        client = FakeClient(fail_part=2)
+        with self.assertRaises(IOError):
+            with S3Writer(client, 'bucket', 'key', part_size=10) as file:
+                file.write(b'x' * 25)
+        assert client.calls == ['create_multipart_upload', 'abort_multipart_upload']
+
+    def test_write__exception_in_block_aborts_upload(self):
+        client = FakeClient()
+        with self.assertRaises(ValueError):
+            with S3Writer(client, 'bucket', 'key', part_size=10) as file:
+                file.write(b'x' * 25)
+                raise ValueError()
+        assert client.calls == ['create_multipart_upload', 'abort_multipart_upload']
+
+
+class S3CopyTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.s3 = S3('key', 'secret', 'target')
+        self.s3.client = FakeClient()
+
+    def test_copy__small_object_uses_copy_object(self):
+        self.s3.client.size = 1024
+        self.s3.copy('source', 'dev/report_1/file.csv', 'file.csv')
+        assert self.s3.client.calls == ['copy_object']
+
+    def test_copy__large_object_uses_multipart_copy(self):
+        gb = 1024 ** 3
+        self.s3.client.size = 6 * gb
+        self.s3.copy('source', 'dev/report_1/file.csv', 'file.csv', part_size=4 * gb)
+        assert self.s3.client.calls == ['create_multipart_upload', 'complete_multipart_upload']
+        assert self.s3.client.parts == {1: f'bytes=0-{4 * gb - 1}', 2: f'bytes={4 * gb}-{6 * gb - 1}'}
+
+
+class ClientCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        clients.clear()
+
+    def test_get__reuses_client_per_credentials(self):
+        s3, other = S3('key', 'secret', 'bucket1'), S3('key', 'secret', 'bucket2', region='eu-west-1')
+        s3.connect()
+        other.connect()
+        assert S3('key', 'secret', 'bucket3').client is None
+        assert clients.get('key', 'secret', 'us-east-1') is s3.client
+        assert clients.get('key', 'secret', 'eu-west-1') is other.client
+        assert s3.client is not other.client
+
+    def test_get__evicts_idle_clients(self):
+        cache = ClientCache(idle_timeout=0)
+        client = cache.get('key', 'secret', 'us-east-1')
+        assert cache.get('key', 'secret', 'us-east-1') is not client
+
+    def test_get__resets_after_fork(self):
+        cache = ClientCache()
+        client = cache.get('key', 'secret', 'us-east-1')
+        cache.pid = -1  # as seen from a forked child
+        assert cache.get('key', 'secret', 'us-east-1') is not client
+
+    @benchmark
+    def test_benchmark__per_task_client_overhead(self):
+        runs = 20
+        started = time.monotonic()
+        for _ in range(runs):
+            boto3.client('s3', aws_access_key_id='key', aws_secret_access_key='secret', region_name='us-east-1')
+        before = (time.monotonic() - started) / runs
+        started = time.monotonic()
+        for _ in range(runs):
+            S3('key', 'secret', 'bucket').connect()
+        after = (time.monotonic() - started) / runs
+        assert after < before, f'client per task: {before * 1000:.2f}ms uncached, {after * 1000:.2f}ms cached'
+
+
+class S3DownloadTestCase(SimpleTestCase):
+
+    def test_download__ranged_parallel(self):
+        s3 = S3('key', 'secret', 'bucket')
+        s3.client = FakeClient()
+        s3.client.data = os.urandom(1000)
+        s3.client.size = len(s3.client.data)
+        with tempfile.TemporaryDirectory() as dir:
+            local = os.path.join(dir, 'file.csv')
+            s3.download(local, 'file.csv', workers=4, chunk_size=300)
+            with open(local, 'rb') as file:
+                assert file.read() == s3.client.data
+        assert sorted(s3.client.calls) == ['bytes=0-299', 'bytes=300-599', 'bytes=600-899', 'bytes=900-999']
+
+
+class MimetypeTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.s3 = S3('key', 'secret', 'bucket')
+
+    def test_get_mimetype__override_and_extension(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            assert self.s3.get_mimetype(file.name, content_type='text/plain') == 'text/plain'
+            assert self.s3.get_mimetype(file.name) == 'text/csv'
+        assert self.s3.get_mimetype(b'{}', 'dir/report.jsonl') == 'application/x-ndjson'
+        assert self.s3.get_mimetype(None, 'dir/report.csv.gz') == 'application/gzip'
+        assert self.s3.get_mimetype('some content') == 'text/plain'
+
+    def test_get_mimetype__string_content_is_not_a_name(self):
+        guess_mimetype.cache_clear()
+        assert self.s3.get_mimetype('a,b\n1,report.csv') == 'text/plain'
+        assert guess_mimetype.cache_info().currsize == 0
+
+    @unittest.skipUnless(magic, 'python-magic is not installed')
+    def test_get_mimetype__sniffs_file_objects_without_moving_them(self):
+        src = BytesIO(b'%PDF-1.4\n' + b'0' * 10000)
+        assert self.s3.get_mimetype(src, 'report') == 'application/pdf'
+        assert src.tell() == 0
+
+    @benchmark
+    @unittest.skipUnless(magic, 'python-magic is not installed')
+    def test_benchmark__upload_preparation_latency(self):
+        runs = 200
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            file.write(b'a,b,c\n1,2,3\n' * 100000)
+            file.flush()
+            started = time.monotonic()
+            for _ in range(runs):
+                magic.from_file(file.name, mime=True)
+            before = (time.monotonic() - started) / runs
+            started = time.monotonic()
+            for _ in range(runs):
+                self.s3.get_mimetype(file.name)
+            after = (time.monotonic() - started) / runs
+        assert after < before, f'upload mimetype: {before * 1000000:.1f}us libmagic, {after * 1000000:.1f}us resolver'
@@ -1,7 +1,16 @@
+from django.apps import apps
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError, Throttled
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.views import APIView
+
+from srt.core.events import TYPES, Stream, subscribe, format_event
+from srt.core.helpers import to_list
+from srt.core.models import TERMINAL
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -21,3 +30,42 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             token = str(AccessToken().for_user(user))
 
         return Response({**serializer.validated_data, **{'token': str(token)}}, status=HTTP_200_OK)
+
+
+class EventsView(APIView):
+    """
+    Server-sent events of running reports and deliveries, e.g. /api/v1/events/?type=reports&ids=1,2 streams the
+    current state of report histories 1 and 2, then their status, progress and row count changes until they are
+    done. A stream holds a server thread: it lasts EVENTS_MAX_AGE seconds at most, EventSource clients reconnect
+    then, and a process serves EVENTS_MAX_STREAMS at once, further requests are throttled.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        types = to_list(request.query_params.get('type'))
+        if len(types) != 1 or types[0] not in TYPES:
+            raise ValidationError({'type': f'expected one of {", ".join(TYPES)}'})
+        try:
+            ids = {int(id) for id in to_list(request.query_params.get('ids'))}
+        except ValueError:
+            raise ValidationError({'ids': 'expected comma separated ids'})
+        if not ids:
+            raise ValidationError({'ids': 'expected the ids of the histories to watch'})
+
+        pubsub = subscribe(types)  # before the snapshot, changes made while it is read are streamed after it
+        histories = list(apps.get_model(types[0], 'History').objects.filter(id__in=ids)
+                         .values('id', 'status', 'progress'))
+        running = ids - {history['id'] for history in histories if history['status'] in TERMINAL}
+        snapshot = [format_event({'type': types[0], **history}) for history in histories]
+        if running:
+            events = Stream.open(pubsub, running, snapshot)
+            if events is None:
+                pubsub.close()
+                raise Throttled(detail='Too many event streams are open, retry later')
+        else:
+            pubsub.close()
+            events = snapshot
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # let proxies pass events through right away
+        return response
@@ -1,5 +1,11 @@
 from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AdminDateWidget
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
 from srt.deliveries.models import Target, Delivery, History, KIND
 from srt.deliveries.mixins import TargetAdminMixin, HistoryAdminMixin, DeliveryAdminMixin
@@ -10,6 +16,12 @@ from srt.core.codemirror2 import json_widget, python_widget
 JSON_WIDGET = json_widget(readonly=True)
 PYTHON_WIDGET = python_widget(readonly=True)
 
+# columns the history pages render, msg (a traceback at times) is only loaded when a history is opened
+LIST_FIELDS = [
+    'id', 'status', 'progress', 'url', 'task_id', 'created', 'modified', 'history__id', 'history__report__id',
+    'history__report__name', 'delivery__id', 'delivery__path', 'delivery__target__id', 'delivery__target__name',
+]
+
 
 class TargetForm(forms.ModelForm):
     password = forms.CharField(label='Password', required=False, widget=forms.PasswordInput(render_value=True))
@@ -26,6 +38,7 @@ class TargetAdmin(admin.ModelAdmin, TargetAdminMixin):
         (None, {'fields': ['name']}),
         ('Details', {'fields': ['kind', 'host', 'username', 'password', 'path', 'emails']}),
         ('Delivery', {'fields': ['deliveries_url']}),
+        ('Transfer', {'classes': ['collapse'], 'fields': ['download_workers', 'download_chunk_size']}),
         ('System', {'classes': ['collapse'], 'fields': [
             'notes', 'created', 'modified',
         ]}),
@@ -44,6 +57,9 @@ class TargetAdmin(admin.ModelAdmin, TargetAdminMixin):
     ordering = ['name']
     filter_horizontal = []
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(deliveries_count=self.get_count(Delivery, 'target'))
+
 
 @admin.register(Delivery)
 class DeliveryAdmin(admin.ModelAdmin, DeliveryAdminMixin):
@@ -63,6 +79,14 @@ class DeliveryAdmin(admin.ModelAdmin, DeliveryAdminMixin):
     ]
     ordering = ['-id']
     filter_horizontal = []
+    list_select_related = ['report', 'target']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(delivered_count=self.get_count(History, 'delivery'))
+
+
+class RelaunchFailedForm(forms.Form):
+    since = forms.DateField(widget=AdminDateWidget, help_text="Deliveries whose last attempt since then failed")
 
 
 class HistoryForm(forms.ModelForm):
@@ -72,13 +96,16 @@ class HistoryForm(forms.ModelForm):
 @admin.register(History)
 class HistoryAdmin(admin.ModelAdmin, HistoryAdminMixin):
     form = HistoryForm
-    list_display = ['id', 'history_url', 'status', 'modified']
+    change_list_template = 'admin/deliveries/history/change_list.html'
+    list_display = ['id', 'history_url', 'status', 'progress', 'modified']
     list_filter = ['status']
     search_fields = ['msg']
-    readonly_fields = ['history_url', 'delivery_url', 'status', 'file_url', 'task_id', 'created', 'modified']
+    readonly_fields = [
+        'history_url', 'delivery_url', 'status', 'progress', 'file_url', 'task_id', 'created', 'modified',
+    ]
     fieldsets = [
         (None, {'fields': ['history_url', 'delivery_url']}),
-        ('Status', {'fields': ['status', 'msg']}),
+        ('Status', {'fields': ['status', 'progress', 'msg']}),
         ('Data', {'fields': ['file_url']}),
         ('System', {'classes': ['collapse'], 'fields': [
             'task_id', 'created', 'modified',
@@ -93,13 +120,41 @@ class HistoryAdmin(admin.ModelAdmin, HistoryAdminMixin):
         css = {'all': ['css/save-no-add.css']}
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('history__report')
+        queryset = super().get_queryset(request).select_related('history__report', 'delivery__target')
+        return queryset.only(*LIST_FIELDS)
 
     def has_add_permission(self, request):
         return False
 
-    @message_user("Launched selected deliveries")
+    @message_user()
     def relaunch(self, request, queryset):
-        for history in queryset:
-            History.launch(history.history, history.delivery)
+        launched = History.relaunch(queryset, rate=settings.DELIVERIES_RELAUNCH_RATE)
+        skipped = queryset.count() - len(launched)
+        self.message_user(request, f'Launched {len(launched)} selected deliveries' +
+                          (f', {skipped} over the rate limit were skipped: relaunch them later' if skipped else ''))
     relaunch.short_description = 'Relaunch deliveries'
+
+    def get_urls(self):
+        return [
+            path('relaunch-failed/', self.admin_site.admin_view(self.relaunch_failed_view),
+                name='deliveries_history_relaunch_failed'),
+        ] + super().get_urls()
+
+    def relaunch_failed_view(self, request):
+        """ Relaunch every delivery failed since a date in the background, linked from the changelist. """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = RelaunchFailedForm(request.POST or None)
+        if form.is_valid():
+            from srt.deliveries.tasks.relaunch import RelaunchFailed
+            RelaunchFailed().delay(form.cleaned_data['since'].isoformat())
+            self.message_user(request, 'Relaunching failed deliveries in the background')
+            return redirect('admin:deliveries_history_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Relaunch failed deliveries',
+            'opts': self.model._meta,
+            'form': form,
+            'media': self.media + form.media,
+        }
+        return TemplateResponse(request, 'admin/deliveries/history/relaunch_failed.html', context)
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.4 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0005_auto_20190808_1649'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='target',
+            name='download_chunk_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Size of every ranged download in MB, defaults to AWS_S3_DOWNLOAD_CHUNK_SIZE', null=True, verbose_name='Download chunk size'),
+        ),
+        migrations.AddField(
+            model_name='target',
+            name='download_workers',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Parallel ranged downloads of the report, defaults to AWS_S3_DOWNLOAD_WORKERS', null=True, verbose_name='Download workers'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.4 on 2026-10-18 15:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY does not block writes, but cannot run in a transaction. A failed build leaves an
+    # INVALID index behind, so each index is dropped before it is built again.
+    atomic = False
+
+    dependencies = [
+        ('deliveries', '0007_history_progress'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL([
+                    'DROP INDEX CONCURRENTLY IF EXISTS "deliveries_hist_delivery_idx"',
+                    'CREATE INDEX CONCURRENTLY "deliveries_hist_delivery_idx" '
+                    'ON "deliveries_history" ("delivery_id", "id" DESC)',
+                ], reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "deliveries_hist_delivery_idx"',
+                ),
+                migrations.RunSQL([
+                    'DROP INDEX CONCURRENTLY IF EXISTS "deliveries_hist_busy_idx"',
+                    'CREATE INDEX CONCURRENTLY "deliveries_hist_busy_idx" '
+                    'ON "deliveries_history" ("id" DESC) WHERE "status" IN (\'pending\', \'processing\')',
+                ], reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "deliveries_hist_busy_idx"',
+                ),
+                # the foreign key index, redundant with the one above
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "deliveries_history_delivery_id_cc7c5a2a"',
+                    reverse_sql=[
+                        'DROP INDEX CONCURRENTLY IF EXISTS "deliveries_history_delivery_id_cc7c5a2a"',
+                        'CREATE INDEX CONCURRENTLY "deliveries_history_delivery_id_cc7c5a2a" '
+                        'ON "deliveries_history" ("delivery_id")',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='history',
+                    index=models.Index(fields=['delivery', '-id'], name='deliveries_hist_delivery_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='history',
+                    index=models.Index(condition=models.Q(status__in=['pending', 'processing']), fields=['-id'], name='deliveries_hist_busy_idx'),
+                ),
+                migrations.AlterField(
+                    model_name='history',
+                    name='delivery',
+                    field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='deliveries.Delivery'),
+                ),
+            ],
+        ),
+    ]
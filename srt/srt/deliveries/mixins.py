@@ -8,7 +8,8 @@ from srt.core.mixins import BaseAdminMixin
 class TargetAdminMixin(BaseAdminMixin):
 
     def deliveries_url(self, obj):
-        return self.get_url(Delivery, plural='deliveries', target=obj.id)
+        return self.get_url(Delivery, plural='deliveries', count=getattr(obj, 'deliveries_count', None),
+            target=obj.id)
     deliveries_url.short_description = 'Deliveries'
 
 
@@ -29,7 +30,8 @@ class DeliveryAdminMixin(BaseAdminMixin):
     target_url.short_description = 'Target'
 
     def delivered_url(self, obj):
-        return self.get_url(History, singular='delivered', plural='delivered', delivery=obj.id)
+        return self.get_url(History, singular='delivered', plural='delivered',
+            count=getattr(obj, 'delivered_count', None), delivery=obj.id)
     delivered_url.short_description = 'Delivered'
 
 
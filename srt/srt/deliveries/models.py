@@ -1,11 +1,16 @@
 import os
+import uuid
+from collections import Counter
 
-from django.db import models
+from celery import group
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
 from model_utils.choices import Choices
 from fernet_fields import EncryptedTextField
 
 from srt.reports.models import Report
-from srt.core.models import BaseModel, STATUS
+from srt.core.models import BaseModel, STATUS, BUSY
 
 
 KIND = Choices(('s3', 'S3'), ('ftp', 'FTP'), ('sftp', 'SFTP'), ('email', 'Email'))
@@ -25,6 +30,10 @@ class Target(BaseModel):
     emails = models.CharField('Emails', max_length=128, blank=True, null=True,
         help_text="Comma-delimited list of email addresses")
     include_attachment = models.BooleanField('Include attachment', default=False)
+    download_workers = models.PositiveSmallIntegerField('Download workers', blank=True, null=True,
+        help_text="Parallel ranged downloads of the report, defaults to AWS_S3_DOWNLOAD_WORKERS")
+    download_chunk_size = models.PositiveIntegerField('Download chunk size', blank=True, null=True,
+        help_text="Size of every ranged download in MB, defaults to AWS_S3_DOWNLOAD_CHUNK_SIZE")
     notes = models.TextField('Notes', default='', blank=True)
 
     class Meta:
@@ -82,33 +91,94 @@ class Delivery(BaseModel):
 
     @staticmethod
     def deliver(report_history):
-        for delivery in Delivery.objects.filter(report_id=report_history.report_id, is_active=True):
-            History.launch(report_history, delivery)
+        deliveries = Delivery.objects.filter(report_id=report_history.report_id, is_active=True)
+        return History.bulk_launch(report_history, deliveries.select_related('target'))
 
 
 class History(BaseModel):
     from srt.reports.models import History as ReportHistory
     history = models.ForeignKey(ReportHistory, null=True, on_delete=models.SET_NULL)
-    delivery = models.ForeignKey(Delivery, null=True, on_delete=models.SET_NULL)
+    delivery = models.ForeignKey(Delivery, null=True, on_delete=models.SET_NULL, db_index=False)  # see Meta.indexes
     status = models.CharField('Status', max_length=16, choices=STATUS, default=STATUS.pending,
         db_index=True)
     url = models.URLField('URL', max_length=256, null=True, blank=True)
     msg = models.TextField('msg', null=True, blank=True)
     task_id = models.CharField('task_id', max_length=128, null=True)
+    progress = models.PositiveSmallIntegerField('Progress', default=0, help_text="Percent done")
 
     class Meta:
         app_label = 'deliveries'
         verbose_name_plural = 'History'
         ordering = ['-id']
+        indexes = [
+            # latest histories of a delivery, newest first, and running histories, created with CONCURRENTLY
+            models.Index(fields=['delivery', '-id'], name='deliveries_hist_delivery_idx'),
+            models.Index(fields=['-id'], condition=Q(status__in=BUSY), name='deliveries_hist_busy_idx'),
+        ]
 
     @classmethod
     def launch(cls, report_history, delivery, **kw):
         history = cls(**kw)
         history.history = report_history
         history.delivery = delivery
+        history.task_id = str(uuid.uuid4())
         history.save()
 
-        # launch
-        history.task_id = delivery.task.delay({'history-id': history.id}).task_id
-        history.save(update_fields=['task_id'])
+        # launch once the row is visible to workers
+        transaction.on_commit(lambda: delivery.task.apply_async(({'history-id': history.id},),
+            task_id=history.task_id))
         return history
+
+    @classmethod
+    def bulk_launch(cls, report_history, deliveries, rate=None, **kw):
+        """ Launch many deliveries with one INSERT and one group publish, task ids are assigned up front. """
+        return cls.launch_all([cls(history=report_history, delivery=delivery, **kw) for delivery in deliveries], rate)
+
+    @classmethod
+    def relaunch(cls, queryset, rate=None, launched=None):
+        """
+        Launch the deliveries of the histories of queryset again, without loading their reports. Histories whose
+        delivery or report history was deleted are left out.
+        """
+        queryset = queryset.filter(history__isnull=False, delivery__isnull=False)
+        queryset = queryset.select_related('delivery__target').only(
+            'history_id', 'delivery__id', 'delivery__target__id', 'delivery__target__kind')
+        return cls.launch_all([cls(history_id=history.history_id, delivery=history.delivery)
+                               for history in queryset], rate, launched)
+
+    @classmethod
+    def launch_all(cls, histories, rate=None, launched=None):
+        """
+        Insert unsaved histories in batches and publish their tasks as one group once committed. rate, in
+        deliveries per second and target, staggers the tasks with countdowns so a target is not flooded,
+        launched counts the tasks already staggered per target by previous calls. Histories whose countdown
+        would reach DELIVERIES_MAX_COUNTDOWN are left out, to be launched by a later call; the launched ones
+        are returned.
+        """
+        launched = Counter() if launched is None else launched
+        countdowns = []
+        if rate:
+            due = []
+            for history in histories:
+                countdown = launched[history.delivery.target_id] / rate
+                if countdown < settings.DELIVERIES_MAX_COUNTDOWN:
+                    due.append(history)
+                    countdowns.append(countdown)
+                    launched[history.delivery.target_id] += 1
+            histories = due
+        if not histories:
+            return []
+        for history in histories:
+            history.task_id = str(uuid.uuid4())
+        cls.objects.bulk_create(histories, batch_size=settings.DELIVERIES_BATCH_SIZE)
+
+        signatures = []
+        for i, history in enumerate(histories):
+            options = {'task_id': history.task_id}
+            if rate:
+                options['countdown'] = countdowns[i]
+            signatures.append(history.delivery.task.signature(({'history-id': history.id},), **options))
+
+        # launch once the rows are visible to workers
+        transaction.on_commit(lambda: group(signatures).apply_async())
+        return histories
@@ -23,7 +23,7 @@ class Transport(Task):
             self.update(state, STATUS.processing)
             self.prepare(state, dir)
             self.deliver(state)
-            self.update(state, STATUS.completed, 'delivered to %s' % self.destination(state))
+            self.update(state, STATUS.completed, 'delivered to %s' % self.destination(state), progress=100)
         except Exception as e:
             self.update(state, STATUS.failed, msg=e)
         finally:
@@ -40,18 +40,22 @@ class Transport(Task):
         state.filename = os.path.basename(state.remote)
         return state
 
-    def update(self, state, status=None, msg=''):
-        params = {**{'msg': msg}, **{'status': status}} if status else {}
-        for field, value in params.items():
-            setattr(state.history, field, value)
-        state.history.save(update_fields=list(params))
+    def update(self, state, status=None, msg='', progress=None):
+        """ Buffered, written at most every PROGRESS_FLUSH_INTERVAL seconds and on terminal statuses. """
+        changes = {'status': status, 'msg': str(msg)} if status else {'msg': str(msg)} if msg else {}
+        if progress is not None:
+            changes['progress'] = progress
+        state.history.tracker().update(**changes)
 
     def prepare(self, state, dir):
         self.update(state, msg='preparing')
         state.local = os.path.join(dir, state.filename)
         bucket, env, remote = self.extract_s3_parts(state.url)
         s3 = S3(settings.AWS_KEY, settings.AWS_SECRET, bucket, env)
-        s3.download(state.local, remote)
+        target = state.delivery.target
+        workers = target.download_workers or settings.AWS_S3_DOWNLOAD_WORKERS
+        chunk_size = target.download_chunk_size or settings.AWS_S3_DOWNLOAD_CHUNK_SIZE
+        s3.download(state.local, remote, workers=workers, chunk_size=chunk_size * 1024 * 1024)
 
     def extract_s3_parts(self, s3url):
         values = s3url.replace('https://', '').replace('http://', '').replace('.s3.amazonaws.com', '').split('/')
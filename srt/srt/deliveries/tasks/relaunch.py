@@ -0,0 +1,49 @@
+from collections import Counter
+
+from celery import Task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from srt.deliveries.models import History
+from srt.core.manage import register
+from srt.core.models import STATUS
+from srt.core.helpers import get_logger
+
+logger = get_logger(__name__)
+
+
+@register()
+class RelaunchFailed(Task):
+    """
+    Relaunch every delivery whose last attempt since a date failed, in batches of DELIVERIES_BATCH_SIZE walked
+    by id, throttled to rate deliveries per second and target. Running it twice relaunches nothing twice, so when a
+    target has more deliveries than fit under DELIVERIES_MAX_COUNTDOWN it runs again once those are due.
+    """
+    abstract = False
+
+    def run(self, since, rate=None, *args, **kwargs):
+        rate = settings.DELIVERIES_RELAUNCH_RATE if rate is None else rate
+        retried = History.objects.filter(history=OuterRef('history'), delivery=OuterRef('delivery'),
+            id__gt=OuterRef('id'))
+        failed = History.objects.filter(status=STATUS.failed, created__gte=since, history__isnull=False)
+        failed = failed.annotate(retried=Exists(retried))  # histories of deleted reports have nothing to deliver
+        failed = failed.filter(retried=False).order_by('id')
+
+        count, last_id, launched = 0, 0, Counter()
+        while True:
+            ids = list(failed.filter(id__gt=last_id).values_list('id', flat=True)[:settings.DELIVERIES_BATCH_SIZE])
+            if not ids:
+                break
+            with transaction.atomic():
+                count += len(History.relaunch(History.objects.filter(id__in=ids), rate, launched))
+            last_id = ids[-1]
+        logger.info(f'relaunched {count} deliveries failed since {since}')
+        if rate and max(launched.values(), default=0) / rate >= settings.DELIVERIES_MAX_COUNTDOWN:
+            self.apply_async(kwargs={'since': since, 'rate': rate}, countdown=settings.DELIVERIES_MAX_COUNTDOWN)
+        return count
+
+
+if __name__ == '__main__':
+    job = RelaunchFailed()
+    job.run()
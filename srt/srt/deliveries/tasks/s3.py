@@ -1,16 +1,33 @@
+import os
+
+from botocore.exceptions import ClientError
+
 from srt.deliveries.tasks.base import Transport
 from srt.core.manage import register
 from srt.core.s3 import S3
+from srt.core.helpers import get_logger
+
+logger = get_logger(__name__)
 
 
 @register()
 class S3Transport(Transport):
     abstract = False
 
+    def prepare(self, state, dir):
+        # reports already live on s3, so deliver copies them server-side and downloads only as a fallback
+        state.dir = dir
+
     def deliver(self, state):
         bucket, *remote = state.remote.strip('/').split('/', 1)
         s3 = S3(state.delivery.target.username, state.delivery.target.password, bucket)
-        s3.upload(state.local, remote[0])
+        source_bucket, env, source = self.extract_s3_parts(state.url)
+        try:
+            s3.copy(source_bucket, os.path.join(env, source), remote[0])
+        except ClientError as e:
+            logger.warning(f'unable to copy {state.url} server-side, falling back to download: {e}')
+            super().prepare(state, state.dir)
+            s3.upload(state.local, remote[0])
 
     @staticmethod
     def destination(state):
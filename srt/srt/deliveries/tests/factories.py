@@ -0,0 +1,35 @@
+from factory import DjangoModelFactory, Faker, SubFactory
+
+from srt.deliveries.models import Target, Delivery, History, KIND
+from srt.reports.tests.factories import ReportFactory, HistoryFactory as ReportHistoryFactory
+
+
+class TargetFactory(DjangoModelFactory):
+
+    class Meta:
+        model = Target
+
+    name = Faker('word')
+    kind = KIND.s3
+    username = 'key'
+    password = 'secret'
+    path = '/bucket/'
+
+
+class DeliveryFactory(DjangoModelFactory):
+
+    class Meta:
+        model = Delivery
+
+    target = SubFactory(TargetFactory)
+    report = SubFactory(ReportFactory)
+    path = 'report.csv'
+
+
+class HistoryFactory(DjangoModelFactory):
+
+    class Meta:
+        model = History
+
+    history = SubFactory(ReportHistoryFactory)
+    delivery = SubFactory(DeliveryFactory)
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from srt.core.tests import benchmark
+from srt.deliveries.admin import HistoryAdmin
+from srt.deliveries.models import History
+from srt.deliveries.tests.factories import DeliveryFactory
+from srt.reports.tests.factories import HistoryFactory as ReportHistoryFactory
+from srt.users.tests.factories import StaffUserFactory
+
+
+class HistoryAdminTestCase(TestCase):
+    rows = 1000
+    msg = 'Traceback ' * 100
+
+    @classmethod
+    def setUpTestData(cls):
+        deliveries = [DeliveryFactory() for _ in range(10)]
+        report_histories = [ReportHistoryFactory(report=delivery.report) for delivery in deliveries]
+        History.objects.bulk_create([
+            History(history=report_histories[i % 10], delivery=deliveries[i % 10], msg=cls.msg)
+            for i in range(cls.rows)
+        ])
+
+    def setUp(self):
+        self.client.force_login(StaffUserFactory())
+        self.url = reverse('admin:deliveries_history_changelist')
+
+    def get(self, per_page):
+        with patch.object(HistoryAdmin, 'list_per_page', per_page), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        assert response.status_code == 200
+        return queries
+
+    def test_changelist__constant_queries(self):
+        with self.assertNumQueries(4):  # session, user, count, page
+            self.client.get(self.url)
+        small = self.get(10)
+        large = self.get(500)
+        assert len(small) == len(large)
+        page = large[-1]['sql']
+        assert 'JOIN "deliveries_target"' in page
+        assert '"deliveries_history"."msg"' not in page
+
+
+class RelaunchFailedViewTestCase(TestCase):
+
+    def setUp(self):
+        self.client.force_login(StaffUserFactory())
+        self.url = reverse('admin:deliveries_history_relaunch_failed')
+
+    def test_changelist__links_the_view(self):
+        response = self.client.get(reverse('admin:deliveries_history_changelist'))
+        assert self.url in response.content.decode()
+
+    @patch('srt.deliveries.tasks.relaunch.RelaunchFailed.delay')
+    def test_post__relaunches_in_the_background(self, delay):
+        assert self.client.get(self.url).status_code == 200
+        response = self.client.post(self.url, {'since': ''})
+        assert response.status_code == 200 and not delay.called
+        response = self.client.post(self.url, {'since': '2019-08-01'})
+        assert response.status_code == 302 and response['Location'] == reverse('admin:deliveries_history_changelist')
+        delay.assert_called_once_with('2019-08-01')
+
+
+@benchmark
+class HistoryAdminBenchmarkTestCase(HistoryAdminTestCase):
+    """ The changelist against 10k histories with long tracebacks, run with BENCHMARKS set. """
+    rows = 10000
+    msg = 'Traceback ' * 1000
+
+    def test_benchmark__changelist(self):
+        for per_page in [100, 1000]:
+            with patch.object(HistoryAdmin, 'list_per_page', per_page), self.assertNumQueries(4):
+                assert self.client.get(self.url).status_code == 200
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from srt.deliveries.models import Delivery, History
+from srt.deliveries.tests.factories import TargetFactory, DeliveryFactory, HistoryFactory
+from srt.reports.tests.factories import ReportFactory, HistoryFactory as ReportHistoryFactory
+from srt.core.models import STATUS, BUSY
+from srt.core.tests import run_on_commit, assert_index_scan
+
+
+class DeliveryTestCase(TestCase):
+
+    def setUp(self):
+        self.report = ReportFactory()
+        self.deliveries = DeliveryFactory.create_batch(5, report=self.report)
+        DeliveryFactory(report=self.report, is_active=False)
+        self.report_history = ReportHistoryFactory(report=self.report)
+
+    @patch('srt.deliveries.models.group')
+    def test_deliver__bulk_launches_active_deliveries(self, group):
+        with self.assertNumQueries(2):  # select deliveries, insert histories
+            histories = Delivery.deliver(self.report_history)
+        assert group.return_value.apply_async.call_count == 0  # not before commit
+        run_on_commit()
+        assert group.return_value.apply_async.call_count == 1
+        signatures = list(group.call_args[0][0])
+        assert len(signatures) == 5
+        assert {history.delivery for history in histories} == set(self.deliveries)
+        for history, signature in zip(histories, signatures):
+            assert signature.id == history.task_id
+            assert signature.args == ({'history-id': history.id},)
+        assert set(History.objects.values_list('task_id', flat=True)) == {h.task_id for h in histories}
+
+
+class HistoryTestCase(TestCase):
+
+    def test_launch__single_insert_and_dispatch_on_commit(self):
+        delivery = DeliveryFactory()
+        report_history = ReportHistoryFactory(report=delivery.report)
+        with patch('srt.deliveries.tasks.s3.S3Transport.apply_async') as apply_async:
+            with self.assertNumQueries(1):
+                history = History.launch(report_history, delivery)
+            assert not apply_async.called
+            run_on_commit()
+        apply_async.assert_called_once_with(({'history-id': history.id},), task_id=history.task_id)
+        assert History.objects.get(id=history.id).task_id == history.task_id
+
+
+@patch('srt.deliveries.models.group')
+class RelaunchTestCase(TestCase):
+
+    def test_relaunch__batched_and_throttled_per_target(self, group):
+        target, other = TargetFactory(), TargetFactory()
+        failed = [HistoryFactory(delivery=DeliveryFactory(target=target), status=STATUS.failed) for _ in range(3)]
+        failed.append(HistoryFactory(delivery=DeliveryFactory(target=other), status=STATUS.failed))
+        with self.assertNumQueries(2):  # select histories with their targets, insert
+            histories = History.relaunch(History.objects.filter(status=STATUS.failed).order_by('id'), rate=2)
+        run_on_commit()
+        signatures = list(group.call_args[0][0])
+        assert [(h.history_id, h.delivery_id) for h in histories] == [(h.history_id, h.delivery_id) for h in failed]
+        assert [signature.options['countdown'] for signature in signatures] == [0, 0.5, 1, 0]
+        assert History.objects.filter(status=STATUS.pending).count() == 4
+
+    @override_settings(DELIVERIES_MAX_COUNTDOWN=1)
+    def test_relaunch__countdown_capped(self, group):
+        target = TargetFactory()
+        failed = [HistoryFactory(delivery=DeliveryFactory(target=target), status=STATUS.failed) for _ in range(3)]
+        histories = History.relaunch(History.objects.filter(status=STATUS.failed).order_by('id'), rate=2)
+        run_on_commit()
+        assert [h.delivery_id for h in histories] == [h.delivery_id for h in failed[:2]]
+        assert [signature.options['countdown'] for signature in group.call_args[0][0]] == [0, 0.5]
+        assert History.objects.filter(status=STATUS.pending).count() == 2
+
+
+class HistoryIndexesTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.deliveries = DeliveryFactory.create_batch(100)
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO deliveries_history (created, modified, delivery_id, status, progress)
+                SELECT now(), now(), (%s::int[])[1 + i %% 100],
+                       CASE WHEN i %% 100 = 0 THEN 'pending' ELSE 'completed' END, 0
+                FROM generate_series(1, 20000) AS i
+            ''', [[delivery.id for delivery in cls.deliveries]])
+            cursor.execute('ANALYZE deliveries_history')
+
+    def test_latest_of_delivery(self):
+        queryset = History.objects.filter(delivery=self.deliveries[0]).order_by('-id')[:10]
+        assert_index_scan(queryset, 'deliveries_hist_delivery_idx')
+
+    def test_running(self):
+        assert_index_scan(History.objects.filter(status__in=BUSY).order_by('-id')[:10], 'deliveries_hist_busy_idx')
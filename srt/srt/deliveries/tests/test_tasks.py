@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from srt.core.models import STATUS
+from srt.core.tests import run_on_commit
+from srt.deliveries.models import History
+from srt.deliveries.tasks.relaunch import RelaunchFailed
+from srt.deliveries.tests.factories import TargetFactory, HistoryFactory
+
+
+@patch('srt.deliveries.models.group')
+class RelaunchFailedTestCase(TestCase):
+
+    @override_settings(DELIVERIES_BATCH_SIZE=2)
+    def test_run__relaunches_last_failed_attempts_in_batches(self, group):
+        failed = HistoryFactory.create_batch(5, status=STATUS.failed)
+        HistoryFactory(history=failed[0].history, delivery=failed[0].delivery, status=STATUS.completed)
+        HistoryFactory(status=STATUS.completed)
+        assert RelaunchFailed().run('2000-01-01', rate=10) == 4
+        run_on_commit()
+        assert group.return_value.apply_async.call_count == 2
+        countdowns = [s.options['countdown'] for call in group.call_args_list for s in call[0][0]]
+        assert countdowns == [0, 0, 0, 0]  # one delivery per target
+        assert History.objects.filter(status=STATUS.pending).count() == 4
+        assert RelaunchFailed().run('2000-01-01') == 0
+
+    def test_run__skips_histories_of_deleted_reports(self, group):
+        failed = HistoryFactory(status=STATUS.failed)
+        failed.history.delete()
+        assert RelaunchFailed().run('2000-01-01') == 0
+        assert History.objects.count() == 1
+
+    @override_settings(DELIVERIES_MAX_COUNTDOWN=1)
+    def test_run__runs_again_when_countdowns_are_capped(self, group):
+        target = TargetFactory()
+        HistoryFactory.create_batch(3, delivery__target=target, status=STATUS.failed)
+        with patch.object(RelaunchFailed, 'apply_async') as apply_async:
+            assert RelaunchFailed().run('2000-01-01', rate=2) == 2
+            apply_async.assert_called_once_with(kwargs={'since': '2000-01-01', 'rate': 2}, countdown=1)
+            apply_async.reset_mock()
+            assert RelaunchFailed().run('2000-01-01', rate=2) == 1
+            assert not apply_async.called
@@ -34,7 +34,7 @@ class ReportAdmin(admin.ModelAdmin, ReportAdminMixin):
     search_fields = ['name', 'description']
     readonly_fields = ['histories_url', 'created', 'modified']
     fieldsets = [
-        (None, {'fields': ['uid', 'name', 'description', 'params', 'histories_url']}),
+        (None, {'fields': ['uid', 'name', 'description', 'params', 'concurrency', 'histories_url']}),
         ('System', {'classes': ['collapse'], 'fields': ['created', 'modified']}),
     ]
     ordering = ['name']
@@ -52,13 +52,13 @@ class ReportAdmin(admin.ModelAdmin, ReportAdminMixin):
 @admin.register(History)
 class HistoryAdmin(admin.ModelAdmin, HistoryAdminMixin):
     form = HistoryForm
-    list_display = ['id', 'report', 'status']
+    list_display = ['id', 'report', 'status', 'progress', 'coalesced']
     list_filter = ['status']
     search_fields = ['report']
-    readonly_fields = ['path_url', 'task_id', 'created', 'modified']
+    readonly_fields = ['path_url', 'task_id', 'progress', 'coalesced', 'params_hash', 'created', 'modified']
     fieldsets = [
-        (None, {'fields': ['report', 'status', 'path_url', 'params', 'msg', 'task_id']}),
-        ('System', {'classes': ['collapse'], 'fields': ['created', 'modified']}),
+        (None, {'fields': ['report', 'status', 'path_url', 'params', 'msg', 'progress', 'task_id', 'coalesced']}),
+        ('System', {'classes': ['collapse'], 'fields': ['params_hash', 'created', 'modified']}),
     ]
     ordering = ['-id']
     filter_horizontal = []
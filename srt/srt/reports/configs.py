@@ -1,8 +1,10 @@
 from srt.reports.tasks.report1 import Report1
 from srt.reports.tasks.report2 import Report2
+from srt.reports.tasks.sql import SQLReport
 
 
 REPORTS = {
     'report1': Report1(),
     'report2': Report2(),
+    'sql': SQLReport(),
 }
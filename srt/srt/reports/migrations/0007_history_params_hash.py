@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_auto_20190807_1830'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='params_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='Params hash'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.4 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_history_params_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='coalesced',
+            field=models.PositiveIntegerField(default=0, help_text='Launches folded into this one', verbose_name='Coalesced'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='concurrency',
+            field=models.CharField(choices=[('queue', 'Queue: wait for the running launch, then run'), ('coalesce', 'Coalesce: fold into the running launch'), ('skip', 'Skip: drop while a launch is running')], default='queue', help_text='What a launch does while another launch of the report is running', max_length=16, verbose_name='Concurrency'),
+        ),
+    ]
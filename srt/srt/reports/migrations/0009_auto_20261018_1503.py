@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0008_auto_20261018_1500'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='uid',
+            field=models.CharField(choices=[('report1', 'report1'), ('report2', 'report2'), ('sql', 'SQL')], default='report1', max_length=64, verbose_name='Unique ID'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0009_auto_20261018_1503'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Percent done', verbose_name='Progress'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.4 on 2026-10-18 15:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY does not block writes, but cannot run in a transaction. A failed build leaves an
+    # INVALID index behind, so each index is dropped before it is built again.
+    atomic = False
+
+    dependencies = [
+        ('reports', '0010_history_progress'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL([
+                    'DROP INDEX CONCURRENTLY IF EXISTS "reports_history_report_id_idx"',
+                    'CREATE INDEX CONCURRENTLY "reports_history_report_id_idx" '
+                    'ON "reports_history" ("report_id", "id" DESC)',
+                ], reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "reports_history_report_id_idx"',
+                ),
+                migrations.RunSQL([
+                    'DROP INDEX CONCURRENTLY IF EXISTS "reports_history_busy_idx"',
+                    'CREATE INDEX CONCURRENTLY "reports_history_busy_idx" '
+                    'ON "reports_history" ("id" DESC) WHERE "status" IN (\'pending\', \'processing\')',
+                ], reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "reports_history_busy_idx"',
+                ),
+                # the foreign key index, redundant with the one above
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "reports_history_report_id_7b72943e"',
+                    reverse_sql=[
+                        'DROP INDEX CONCURRENTLY IF EXISTS "reports_history_report_id_7b72943e"',
+                        'CREATE INDEX CONCURRENTLY "reports_history_report_id_7b72943e" '
+                        'ON "reports_history" ("report_id")',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='history',
+                    index=models.Index(fields=['report', '-id'], name='reports_history_report_id_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='history',
+                    index=models.Index(condition=models.Q(status__in=['pending', 'processing']), fields=['-id'], name='reports_history_busy_idx'),
+                ),
+                migrations.AlterField(
+                    model_name='history',
+                    name='report',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='reports.Report'),
+                ),
+            ],
+        ),
+    ]
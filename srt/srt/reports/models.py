@@ -1,11 +1,27 @@
 import json
+import uuid
+import hashlib
+import datetime
 
-from django.db import models
+import redis
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 from model_utils import Choices
 
-from srt.core.models import BaseModel, STATUS
+from srt.core.models import BaseModel, STATUS, BUSY
+from srt.core.helpers import get_logger
+from srt.core.locks import Lease
 
-UID = Choices('report1', 'report2')
+logger = get_logger(__name__)
+
+UID = Choices('report1', 'report2', ('sql', 'SQL'))
+CONCURRENCY = Choices(
+    ('queue', 'Queue: wait for the running launch, then run'),
+    ('coalesce', 'Coalesce: fold into the running launch'),
+    ('skip', 'Skip: drop while a launch is running'),
+)
 
 
 class Report(BaseModel):
@@ -13,6 +29,8 @@ class Report(BaseModel):
     name = models.CharField('Name', max_length=128)
     description = models.TextField(null=True, blank=True)
     params = models.TextField('Params', null=True)
+    concurrency = models.CharField('Concurrency', max_length=16, choices=CONCURRENCY, default=CONCURRENCY.queue,
+        help_text="What a launch does while another launch of the report is running")
 
     class Meta:
         app_label = 'reports'
@@ -31,28 +49,95 @@ class Report(BaseModel):
 
 
 class History(BaseModel):
-    report = models.ForeignKey(Report, on_delete=models.CASCADE)
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, db_index=False)  # see Meta.indexes
     status = models.CharField('Status', max_length=16, choices=STATUS, default=STATUS.pending, db_index=True)
     path = models.CharField('Path', max_length=256, null=True, blank=True)
     params = models.TextField('Params', null=True)
     msg = models.CharField('msg', max_length=256, null=True, blank=True)
     task_id = models.CharField('task_id', max_length=128, null=True)
+    params_hash = models.CharField('Params hash', max_length=64, null=True, blank=True, db_index=True)
+    coalesced = models.PositiveIntegerField('Coalesced', default=0, help_text="Launches folded into this one")
+    progress = models.PositiveSmallIntegerField('Progress', default=0, help_text="Percent done")
 
     class Meta:
         app_label = 'reports'
         verbose_name_plural = 'Histories'
         ordering = ['-id']
+        indexes = [
+            # latest histories of a report, newest first, and running histories, created with CONCURRENTLY
+            models.Index(fields=['report', '-id'], name='reports_history_report_id_idx'),
+            models.Index(fields=['-id'], condition=Q(status__in=BUSY), name='reports_history_busy_idx'),
+        ]
 
     def __str__(self):
         return f'history_{self.id}'
 
+    @staticmethod
+    def get_params_hash(report, params):
+        """ Cache key of a run, params is the canonical (sorted) json stored on the history. """
+        return hashlib.sha256(f'{report.uid}:{params}'.encode()).hexdigest()
+
+    @property
+    def lease_name(self):
+        """ Name of the lease of the report, held while a history of it is processing. """
+        return f'report-{self.report_id}'
+
+    def is_running(self):
+        """ Whether the run of a processing history is alive, it holds the lease until it is done. """
+        try:
+            return str(Lease(self.lease_name).holder()) == str(self.id)
+        except redis.RedisError as e:
+            logger.warning(f'unable to check the lease of report {self.report_id}: {e}')
+            return True
+
+    @classmethod
+    def get_cached(cls, report, params_hash):
+        """
+        A running history of report with the same key, or one of any report completed less than REPORTS_CACHE_TTL
+        seconds ago. Runs of other reports in flight are not shared, they would not deliver to this report. A run
+        is running while it holds the lease of the report, or is pending for less than REPORTS_PENDING_TTL seconds:
+        the rows of crashed runs are left busy.
+        """
+        if not settings.REPORTS_CACHE_TTL:
+            return None
+        now = timezone.now()
+        expired = now - datetime.timedelta(seconds=settings.REPORTS_CACHE_TTL)
+        queued = now - datetime.timedelta(seconds=settings.REPORTS_PENDING_TTL)
+        running = Q(status=STATUS.processing) | Q(status=STATUS.pending, created__gte=queued)
+        completed = Q(status=STATUS.completed, path__isnull=False, created__gte=expired)
+        histories = cls.objects.filter(params_hash=params_hash)  # the hash includes the report uid
+        histories = histories.filter(Q(running, report=report) | completed).order_by('-id')
+        cached = histories.first()
+        if cached and cached.status == STATUS.processing and not cached.is_running():
+            cached = histories.exclude(status=STATUS.processing).first()
+        return cached
+
     @classmethod
-    def launch(cls, task, params=None, **kwargs):
+    def launch(cls, task, params=None, task_id=None, **kwargs):
+        """
+        Create a history and dispatch task for it once committed, unless get_cached finds a run to reuse. task_id
+        is the id of a task already running that is going to generate the history itself (beat), nothing is
+        dispatched then.
+        """
         params = params or {}
         history = cls(**kwargs)
         history.params = json.dumps(params, indent=2, sort_keys=True)
+        history.params_hash = cls.get_params_hash(history.report, history.params)
+        cached = cls.get_cached(history.report, history.params_hash)
+        if cached and cached.status in BUSY:
+            return cached  # attach to the run in flight
+        if cached:
+            history.status, history.path = STATUS.completed, cached.path
+            history.msg = f'cached result of history {cached.id}'
+            history.save()
+            if cached.report_id != history.report_id:  # same artifact, but other targets to deliver to
+                from srt.deliveries.models import Delivery
+                Delivery.deliver(history)
+            return history
+        history.task_id = task_id or str(uuid.uuid4())
         history.save()
 
-        task_id = task.delay(**{'history_id': history.id}).task_id
-        history.task_id = task_id
-        history.save(update_fields=['task_id'])
+        # launch once the row is visible to workers
+        if not task_id:
+            transaction.on_commit(lambda: task.apply_async(kwargs={'history_id': history.id}, task_id=history.task_id))
+        return history
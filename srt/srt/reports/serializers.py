@@ -3,15 +3,27 @@ from rest_framework.serializers import ModelSerializer, Serializer, CharField, E
 from srt.reports.models import Report, History
 
 
-class ReportSerializer(ModelSerializer):
+class StaffReportSerializer(ModelSerializer):
 
     class Meta:
         model = Report
-        fields = ['id', 'uid', 'name', 'description', 'params']
+        fields = ['id', 'uid', 'name', 'description', 'params', 'concurrency']
 
 
-class HistorySerializer(ModelSerializer):
+class ReportSerializer(StaffReportSerializer):
+
+    class Meta(StaffReportSerializer.Meta):
+        read_only_fields = ['params']  # sql of SQL reports runs as is
+
+
+class StaffHistorySerializer(ModelSerializer):
 
     class Meta:
         model = History
-        fields = ['id', 'report', 'status', 'path', 'params', 'msg', 'task_id']
+        fields = ['id', 'report', 'status', 'path', 'params', 'msg', 'task_id', 'coalesced', 'progress']
+
+
+class HistorySerializer(StaffHistorySerializer):
+
+    class Meta(StaffHistorySerializer.Meta):
+        read_only_fields = ['params']  # the params a queued history runs with
@@ -0,0 +1,156 @@
+import os
+import csv
+import threading
+from contextlib import contextmanager
+
+import sqlparse
+from django.db import connections, transaction
+
+from srt.core.routers import get_read_alias
+
+
+CHUNK_SIZE = 2000  # rows fetched per round trip from a server-side cursor
+
+
+def iterate(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Model instances, fetched through a named server-side cursor. Like values() and copy() it streams, so report
+    rows() keep worker memory flat whatever the report size:
+
+      def rows(self, history, params):
+          yield from values(User.objects.filter(created__gte=params['start_date']), ['full_name', 'email'])
+    """
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def values(queryset, fields, chunk_size=CHUNK_SIZE):
+    """ Tuples of fields, fetched through a named server-side cursor without building model instances. """
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def fetch(query, params=None, using=None, chunk_size=CHUNK_SIZE):
+    """ Typed tuples of a raw query, fetched through a named server-side cursor like values(). """
+    using = using or get_read_alias()
+    with connections[using].chunked_cursor() as cursor:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+
+
+def check_query(query):
+    """
+    The single SELECT of sql written by a user, without trailing semicolon. Anything else raises ValueError, e.g.
+    sql closing the COPY or subquery it gets wrapped in to run more statements.
+    """
+    statements = [statement for statement in sqlparse.parse(query) if statement.token_first(skip_cm=True)]
+    statements = [statement for statement in statements if str(statement).strip().rstrip(';').strip()]
+    if len(statements) != 1:
+        raise ValueError('The query must be a single statement')
+    statement, = statements
+    if statement.get_type() != 'SELECT':
+        raise ValueError('The query must be a SELECT')
+    depth = 0
+    for token in statement.flatten():
+        if token.match(sqlparse.tokens.Punctuation, '('):
+            depth += 1
+        elif token.match(sqlparse.tokens.Punctuation, ')'):
+            depth -= 1
+        if depth < 0:
+            raise ValueError('The query has unbalanced parentheses')
+    if depth:
+        raise ValueError('The query has unbalanced parentheses')
+    return str(statement).strip().rstrip(';')
+
+
+def get_sql(query, params=None, using=None):
+    """
+    Bound sql of a raw query or a queryset. Like cursor.execute(), a raw query is a format string as soon as params
+    are given, even empty ones: a literal % is written %% then.
+    """
+    using = using or get_read_alias()
+    if hasattr(query, 'query'):
+        query, params = query.query.sql_with_params()
+    if params is None:
+        return query
+    with connections[using].cursor() as cursor:
+        return cursor.mogrify(query, params).decode()
+
+
+def connect(using=None):
+    """
+    A new psycopg2 connection to the database of alias using, besides the one Django shares within the thread.
+    Close it once done.
+    """
+    using = using or get_read_alias()
+    connection = connections[using]
+    raw = connection.get_new_connection(connection.get_connection_params())
+    raw.autocommit = True
+    with raw.cursor() as cursor:
+        cursor.execute('SET TIME ZONE %s', [connection.timezone_name])
+    return raw
+
+
+def copy(query, params=None, using=None, encoding='utf-8'):
+    """
+    Rows of a raw query or a queryset exported by PostgreSQL with COPY ... TO STDOUT, the fastest way out of the
+    database. The export runs in a thread writing to a pipe, so rows are parsed as they arrive. The thread has a
+    connection of its own: the caller can keep querying while it is blocked on the pipe. Being another session,
+    it does not see rows written in an uncommitted transaction. Values come back as strings, NULL as an empty
+    string.
+    """
+    using = using or get_read_alias()
+    sql = f'COPY (\n{get_sql(query, params, using)}\n) TO STDOUT WITH CSV'
+    connection = connect(using)
+    read, write = os.pipe()
+    errors = []
+
+    def export():
+        try:
+            with os.fdopen(write, 'wb') as file, connection.cursor() as cursor:
+                cursor.copy_expert(sql, file)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=export, name='copy', daemon=True)
+    thread.start()
+    try:
+        with os.fdopen(read, 'r', encoding=encoding, newline='') as file:
+            yield from csv.reader(file)
+    finally:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def copy_to(query, file, params=None, header=False, using=None):
+    """ Write the csv export of a raw query or a queryset straight into a binary file-like object. """
+    using = using or get_read_alias()
+    sql = f'COPY (\n{get_sql(query, params, using)}\n) TO STDOUT WITH CSV{" HEADER" if header else ""}'
+    with connections[using].cursor() as cursor:
+        cursor.copy_expert(sql, file)
+
+
+def get_columns(query, params=None, using=None):
+    """ Column names of a raw query or a queryset, without running it. """
+    using = using or get_read_alias()
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT * FROM (\n{get_sql(query, params, using)}\n) AS query LIMIT 0')
+        return [column[0] for column in cursor.description]
+
+
+@contextmanager
+def read_only(using=None):
+    """
+    Run the block in a read only transaction, for queries that come from users. It is only a safety net: they
+    run on a <alias>_sql connection as well, logged in as a role that can only read (DATABASE_SQL_USER).
+    """
+    using = using or get_read_alias()
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute('SET TRANSACTION READ ONLY')
+        yield
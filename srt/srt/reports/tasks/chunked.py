@@ -0,0 +1,43 @@
+from celery import Task, current_app
+
+from srt.reports.models import STATUS
+from srt.core.manage import register
+
+
+class ChunkTask(Task):
+    abstract = True
+
+    def call(self, name, history_id, method, *args):
+        """ Call method of the report task name, a failure marks the whole report history as failed. """
+        task = current_app.tasks[name]
+        history = task.get_history(history_id)
+        try:
+            return getattr(task, method)(history, *args)
+        except Exception as e:
+            history.tracker().update(msg=str(e), status=STATUS.failed)
+            raise
+
+
+@register()
+class ReportPart(ChunkTask):
+    abstract = False
+
+    def run(self, name, history_id, index, params, token=None):
+        return self.call(name, history_id, 'write_part', index, params, token)
+
+
+@register()
+class ReportMerge(ChunkTask):
+    abstract = False
+
+    def run(self, keys, name, history_id, remote, token=None):
+        return self.call(name, history_id, 'merge', keys, remote, token)
+
+
+@register()
+class ReportAbort(ChunkTask):
+    abstract = False
+
+    def run(self, merge_id, name, history_id, token=None):
+        """ Error callback of the ReportMerge merge_id, run instead of it when a part failed. """
+        return self.call(name, history_id, 'abort', token)
@@ -1,53 +1,260 @@
 import os
-import csv
 import json
 import uuid
-import tempfile
-import shutil
+import hashlib
 
+import redis
 from django.conf import settings
-from celery import Task
+from django.db.models import F
+from django.utils import timezone
+from celery import Task, chord
+from celery.exceptions import MaxRetriesExceededError
 
-from srt.reports.models import Report, History, STATUS
+from srt.reports.models import Report, History, STATUS, CONCURRENCY
 from srt.core.manage import register
+from srt.core.pipeline import Pipeline
+from srt.core.formats import get_format
+from srt.core.helpers import date_range, get_logger
+from srt.core.locks import Lease
+from srt.core.routers import replica
 from srt.core.s3 import S3
 
+logger = get_logger(__name__)
+
+INCREMENTAL_PARAMS = ['start_date', 'end_date', 'incremental', 'invalidate']
+
 
 @register()
 class Report1(Task):
+    """
+    Base report task. Set params.incremental to generate start_date..end_date one day at a time: every day is
+    stored under a content-addressed partitions/ key and reused by later runs unless it is today or later, it
+    is listed in params.invalidate or the report version changes. The artifact is the concatenated days.
+    """
     abstract = False
+    version = 1  # bump to invalidate every stored partition of the report
+    partition_days = None  # run start_date..end_date as parallel chunks of days, see partitions()
 
     def run(self, history_id=None, report_id=None, *args, **kwargs):
         if report_id:
             history_id = self._beat(report_id)
-        dir = tempfile.mkdtemp()
+            if not history_id:
+                return
+        history = self.get_history(history_id)
+        lease = self.get_lease(history)
+        try:
+            while not lease.acquire():
+                holder = lease.holder()
+                if holder:
+                    return self.busy(history, holder)
+                # released between acquire() and holder(), try again
+        except redis.RedisError as e:
+            logger.warning(f'unable to lease report {history.report_id}, running unlocked: {e}')
+            lease = None
+        chunked = False
+        try:
+            chunked = self.generate(history, lease)
+        finally:
+            if lease and chunked:
+                self.keep(history, lease)  # until ReportMerge or ReportAbort releases it
+            elif lease:
+                self.release(history, lease)
+
+    def get_lease(self, history, token=None):
+        return Lease(history.lease_name, history.id, ttl=settings.REPORTS_LEASE_TTL, token=token)
+
+    def keep(self, history, lease):
+        """ Hold the lease of a partitioned run for REPORTS_CHORD_LEASE_TTL seconds more, without heartbeat. """
+        lease.stop()
         try:
-            history = self.get_history(history_id)
-            history.modify(status=STATUS.processing)
-            filename = f'{uuid.uuid4()}.csv'
-            local = os.path.join(dir, filename)
-            with open(local, mode='w') as file:
-                writer = csv.writer(file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                writer.writerow(['Full Name', 'system@gmail.com', 10])
+            if not lease.extend(settings.REPORTS_CHORD_LEASE_TTL):
+                logger.warning(f'the lease of report {history.report_id} was lost')
+        except redis.RedisError as e:
+            logger.warning(f'unable to extend the lease of report {history.report_id}: {e}')
+
+    def release(self, history, lease):
+        """ Release the lease of the report, an unreachable redis lets it expire after its ttl instead. """
+        try:
+            lease.release()
+        except redis.RedisError as e:
+            logger.warning(f'unable to release the lease of report {history.report_id}: {e}')
+
+    def generate(self, history, lease=None):
+        """ Generate the artifact of history, True when it goes on in a chord of chunk tasks holding lease. """
+        try:
+            history.tracker().update(status=STATUS.processing)
+            params = json.loads(history.params or '{}')
+            format = get_format(params.get('format'))
+            filename = f'{uuid.uuid4()}.{format.extension}'
             remote = os.path.join(f'report_{history.report.id}', filename)
-            s3 = S3(settings.AWS_KEY, settings.AWS_SECRET, settings.AWS_BUCKET, settings.ENV)
-            s3.upload(local, str(remote), public=True)
-            self.deliver(history)
-            history.modify(path=s3.get_url(remote), status=STATUS.completed)
+            partitions = None if params.get('incremental') else self.partitions(params)
+            if partitions:
+                return self.map_reduce(history, params, format, remote, partitions, lease)
+            s3 = self.get_s3()
+            with self.open(s3, remote, format, public=True) as file, replica():
+                if params.get('incremental'):
+                    self.generate_incremental(history, params, format, s3, file)
+                else:
+                    self.write(history, params, format, file)
+            self.complete(history, s3, remote)
         except Exception as e:
-            history.modify(msg=str(e), status=STATUS.failed)
+            history.tracker().update(msg=str(e), status=STATUS.failed)
+
+    def complete(self, history, s3, remote):
+        self.deliver(history)
+        history.tracker().update(path=s3.get_url(remote), status=STATUS.completed, progress=100)
+
+    def write(self, history, params, format, file):
+        self.pipeline(history, params, format.formatter(self.columns(params))).run(file)
+
+    def pipeline(self, history, params, formatter):
+        """ Row pipeline of the report, row counts are published to the event stream as chunks are written. """
+        progress = history.tracker()
+        return Pipeline(self.rows(history, params), formatter, progress=lambda rows: progress.publish(rows=rows))
+
+    def columns(self, params):
+        """ Column names, written as csv header and used as json keys and parquet schema when set. """
+        return None
+
+    def rows(self, history, params):
+        """
+        Row source of the report, override it in report tasks to stream real data. It runs inside replica(), so
+        querysets of data apps and sources read from a replica, reports and deliveries stay on the primary.
+        """
+        yield ['Full Name', 'system@gmail.com', 10]
+
+    def partitions(self, params):
+        """
+        Params of every chunk of the report, run in parallel as a chord of ReportPart tasks and joined by a
+        ReportMerge task. None runs the report as a single task. By default the date window is split into
+        params.partition_days or partition_days long chunks, override it to partition by ids or anything else.
+        """
+        days = params.get('partition_days') or self.partition_days
+        if not days or not params.get('start_date') or not params.get('end_date'):
+            return None
+        windows = date_range(params['start_date'], params['end_date'], days=int(days))
+        if len(windows) < 2:
+            return None
+        return [{**params, 'start_date': start, 'end_date': end} for start, end in windows]
+
+    def map_reduce(self, history, params, format, remote, partitions, lease=None):
+        """
+        Dispatch the chord of chunk tasks. The token of lease is handed over to them: every chunk extends the
+        lease, ReportMerge releases it, or ReportAbort when a chunk failed and the merge never runs.
+        """
+        from srt.reports.tasks.chunked import ReportPart, ReportMerge, ReportAbort
+        if not format.concatenable:
+            raise ValueError(f'partitioned reports do not support the {format.name} format')
+        token = lease.token if lease else None
+        parts = [ReportPart().s(self.name, history.id, index, partition, token)
+                 for index, partition in enumerate(partitions)]
+        merge = ReportMerge().s(self.name, history.id, remote, token)
+        merge.link_error(ReportAbort().s(self.name, history.id, token))
+        chord(parts)(merge)
+        return True
+
+    def get_parts_dir(self, history):
+        return os.path.join(f'report_{history.report_id}', 'parts', str(history.id))
+
+    def write_part(self, history, index, params, token=None):
+        """ Write one chunk of the report without header, returns its key. """
+        if token:
+            self.keep(history, self.get_lease(history, token))
+        format = get_format(params.get('format'))
+        key = os.path.join(self.get_parts_dir(history), f'{index:05d}.{format.extension}')
+        with self.open(self.get_s3(), key, format) as file, replica():
+            self.pipeline(history, params, format.formatter(self.columns(params), header=False)).run(file)
+        return key
+
+    def merge(self, history, keys, remote, token=None):
+        """ Join the chunks written by write_part into the report artifact. """
+        params = json.loads(history.params or '{}')
+        format = get_format(params.get('format'))
+        s3 = self.get_s3()
+        try:
+            with self.open(s3, remote, format, public=True) as file:
+                file.write(format.header(self.columns(params)))
+                self.concat(s3, keys, file)
+            self.complete(history, s3, remote)
         finally:
-            shutil.rmtree(dir, ignore_errors=True)
+            self.cleanup(history, s3, token)
+
+    def abort(self, history, token=None):
+        """ Error callback of the chord when a chunk failed, the history is failed already. """
+        self.cleanup(history, self.get_s3(), token)
+
+    def cleanup(self, history, s3, token=None):
+        """ Delete the chunks written so far and release the lease handed over to the chord. """
+        parts = self.get_parts_dir(history)
+        for name in list(s3.list(parts, include_dirs=False)):
+            s3.delete(os.path.join(parts, name))
+        if token:
+            self.release(history, self.get_lease(history, token))
+
+    def concat(self, s3, keys, file):
+        for key in keys:
+            for chunk in s3.stream(key):
+                file.write(chunk)
+
+    def busy(self, history, running_id):
+        """
+        Apply the concurrency policy of the report while history running_id holds its lease. A queued run gives
+        up after REPORTS_QUEUE_MAX_RETRIES retries.
+        """
+        policy = history.report.concurrency
+        if policy == CONCURRENCY.queue:
+            try:
+                raise self.retry(kwargs={'history_id': history.id}, countdown=settings.REPORTS_QUEUE_COUNTDOWN,
+                    max_retries=settings.REPORTS_QUEUE_MAX_RETRIES)
+            except MaxRetriesExceededError:
+                history.tracker().update(status=STATUS.stopped, msg=f'gave up waiting for history {running_id}')
+        elif policy == CONCURRENCY.coalesce:
+            History.objects.filter(id=running_id).update(coalesced=F('coalesced') + 1)
+            history.tracker().update(status=STATUS.stopped, msg=f'coalesced into history {running_id}')
+        else:
+            history.tracker().update(status=STATUS.stopped, msg=f'skipped while history {running_id} is running')
+
+    def get_s3(self):
+        return S3(settings.AWS_KEY, settings.AWS_SECRET, settings.AWS_BUCKET, settings.ENV)
+
+    def open(self, s3, remote, format, public=False):
+        return s3.open(remote, public=public, content_type=format.content_type,
+            content_encoding=format.content_encoding, part_size=settings.AWS_S3_PART_SIZE,
+            max_inflight=settings.AWS_S3_MAX_INFLIGHT)
+
+    def generate_incremental(self, history, params, format, s3, file):
+        if not format.concatenable:
+            raise ValueError(f'incremental reports do not support the {format.name} format')
+        columns = self.columns(params)
+        invalidated = set(params.get('invalidate') or [])
+        today = timezone.now().date().isoformat()
+        file.write(format.header(columns))
+        days = date_range(params['start_date'], params['end_date'])
+        for index, (start, end) in enumerate(days):
+            history.tracker().update(progress=100 * index // len(days))
+            key = self.get_partition_key(params, start, format)
+            if start >= today or start in invalidated or not s3.exists(key):
+                logger.info(f'generating partition {start} of history {history.id}')
+                partition = {**params, 'start_date': start, 'end_date': end}
+                with self.open(s3, key, format) as part:
+                    self.pipeline(history, partition, format.formatter(columns, header=False)).run(part)
+            self.concat(s3, [key], file)
+
+    def get_partition_key(self, params, start, format):
+        content = {k: v for k, v in params.items() if k not in INCREMENTAL_PARAMS}
+        content = json.dumps({'task': self.name, 'version': self.version, 'params': content, 'partition': start},
+            sort_keys=True)
+        return os.path.join('partitions', f'{hashlib.sha256(content.encode()).hexdigest()}.{format.extension}')
 
     def get_history(self, id):
         return History.objects.get(id=id)
 
     def _beat(self, report_id):
+        """ History generated by this beat run, None when it attached to a run in flight or reused a result. """
         report = Report.objects.get(id=report_id)
-        params = json.dumps(json.loads(report.params or '{}'), indent=2, sort_keys=True)
-        history = History(**{'report': report, 'params': params, 'task_id': self.request.id})
-        history.save()
-        return history.id
+        task_id = self.request.id or str(uuid.uuid4())
+        history = History.launch(self, params=json.loads(report.params or '{}'), task_id=task_id, report=report)
+        return history.id if history.task_id == task_id else None
 
     def deliver(self, history):
         from srt.deliveries.models import Delivery
@@ -0,0 +1,63 @@
+from django.conf import settings
+
+from srt.reports.tasks.report1 import Report1
+from srt.reports.sources import check_query, copy_to, fetch, get_columns, read_only
+from srt.core.manage import register
+from srt.core.routers import get_sql_alias
+from srt.core.helpers import get_logger
+
+logger = get_logger(__name__)
+
+
+COPY_FORMATS = ['csv', 'csv.gz', 'csv.zst']
+
+
+@register()
+class SQLReport(Report1):
+    """
+    Report defined by the sql of its params, bound with the other params, e.g.:
+
+      {"sql": "SELECT email, created FROM users_user WHERE created::date BETWEEN %(start_date)s AND %(end_date)s"}
+
+    Csv formats are exported by PostgreSQL with COPY straight into the s3 upload, others go through the row
+    pipeline with typed values. The sql must be a single SELECT, it runs in a read only transaction on a read only
+    connection (see DATABASE_SQL_USER), to a replica when one is configured. The sql is always bound, so a literal
+    % is written %%.
+    """
+    abstract = False
+
+    def generate(self, history, lease=None):
+        if not settings.DATABASE_SQL_USER:
+            logger.warning(f'DATABASE_SQL_USER is not set, the sql of history {history.id} runs as the main user')
+        return super().generate(history, lease)
+
+    def write(self, history, params, format, file):
+        if format.name not in COPY_FORMATS:
+            return super().write(history, params, format, file)
+        writer = format.writer(file)
+        using = get_sql_alias()
+        with read_only(using):
+            copy_to(self.get_sql(params), writer, self.get_params(params), header=True, using=using)
+        if writer is not file:
+            writer.close()
+
+    def columns(self, params):
+        using = get_sql_alias()
+        with read_only(using):
+            return get_columns(self.get_sql(params), self.get_params(params), using=using)
+
+    def rows(self, history, params):
+        using = get_sql_alias()
+        with read_only(using):
+            yield from fetch(self.get_sql(params), self.get_params(params), using=using)
+
+    def get_sql(self, params):
+        return check_query(params['sql'])
+
+    def get_params(self, params):
+        return {key: value for key, value in params.items() if key != 'sql'}
+
+
+if __name__ == '__main__':
+    job = SQLReport()
+    job.run()
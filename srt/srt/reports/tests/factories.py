@@ -0,0 +1,21 @@
+from factory import DjangoModelFactory, Faker, SubFactory
+
+from srt.reports.models import Report, History
+
+
+class ReportFactory(DjangoModelFactory):
+
+    class Meta:
+        model = Report
+
+    name = Faker('word')
+    params = '{}'
+
+
+class HistoryFactory(DjangoModelFactory):
+
+    class Meta:
+        model = History
+
+    report = SubFactory(ReportFactory)
+    params = '{}'
@@ -0,0 +1,109 @@
+import json
+import datetime
+from unittest.mock import Mock, patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from srt.core.models import STATUS, BUSY
+from srt.reports.models import History
+from srt.reports.tests.factories import ReportFactory
+from srt.reports.tests.test_tasks import FakeLease
+from srt.core.tests import run_on_commit, assert_index_scan
+
+
+class HistoryTestCase(TestCase):
+
+    def test_launch__single_insert_and_dispatch_on_commit(self):
+        report = ReportFactory()
+        task = Mock()
+        with self.assertNumQueries(2):  # cache lookup, insert
+            history = History.launch(task, params={'b': 1, 'a': 2}, report=report)
+        assert not task.apply_async.called
+        run_on_commit()
+        task.apply_async.assert_called_once_with(kwargs={'history_id': history.id}, task_id=history.task_id)
+        history.refresh_from_db()
+        assert json.loads(history.params) == {'a': 2, 'b': 1}
+        assert history.task_id
+
+
+class HistoryCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.report = ReportFactory(uid='report1')
+        self.task = Mock()
+
+    def launch(self, report=None, **params):
+        return History.launch(self.task, params={'start_date': '2019-08-01', **params}, report=report or self.report)
+
+    def test_launch__attaches_to_running_duplicate(self):
+        history = self.launch()
+        assert self.launch().id == history.id
+        assert self.launch(end_date='2019-08-02').id != history.id
+        assert History.objects.count() == 2
+
+    def test_launch__runs_of_other_reports_in_flight_are_not_shared(self):
+        history = self.launch()
+        other = self.launch(report=ReportFactory(uid='report1'))
+        assert other.id != history.id
+        assert other.status == STATUS.pending and other.task_id
+
+    @patch('srt.reports.models.Lease', FakeLease)
+    def test_launch__stale_running_duplicates_are_not_attached_to(self):
+        history = self.launch()
+        History.objects.filter(id=history.id).update(created=history.created - datetime.timedelta(hours=2))
+        fresh = self.launch()
+        assert fresh.id != history.id and fresh.task_id
+
+        fresh.modify(status=STATUS.processing)
+        FakeLease.holders = {fresh.lease_name: fresh.id}
+        assert self.launch().id == fresh.id
+        FakeLease.holders = {}  # the run crashed without releasing its lease, which expired
+        relaunched = self.launch()
+        assert relaunched.id not in [history.id, fresh.id] and relaunched.status == STATUS.pending
+
+    def test_launch__reuses_completed_result(self):
+        history = self.launch()
+        history.modify(status=STATUS.completed, path='https://bucket/report.csv')
+        with patch('srt.deliveries.models.Delivery.deliver') as deliver:
+            cached = self.launch()
+            assert not deliver.called
+            other = self.launch(report=ReportFactory(uid='report1'))
+            assert deliver.called
+        for hit in [cached, other]:
+            assert hit.id != history.id and hit.status == STATUS.completed and hit.path == history.path
+            assert hit.task_id is None
+
+    def test_launch__expired_or_failed_results_are_recomputed(self):
+        history = self.launch()
+        history.modify(status=STATUS.failed)
+        assert self.launch().id != history.id
+        history = History.objects.first()
+        history.modify(status=STATUS.completed, path='https://bucket/report.csv')
+        History.objects.filter(id=history.id).update(created=history.created - datetime.timedelta(hours=2))
+        assert self.launch().status == STATUS.pending
+        with override_settings(REPORTS_CACHE_TTL=0):
+            assert self.launch().status == STATUS.pending
+
+
+class HistoryIndexesTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reports = ReportFactory.create_batch(100)
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO reports_history (created, modified, report_id, status, params, coalesced, progress)
+                SELECT now(), now(), (%s::int[])[1 + i %% 100],
+                       CASE WHEN i %% 100 = 0 THEN 'pending' ELSE 'completed' END, '{}', 0, 0
+                FROM generate_series(1, 20000) AS i
+            ''', [[report.id for report in cls.reports]])
+            cursor.execute('ANALYZE reports_history')
+
+    def test_latest_of_report(self):
+        queryset = History.objects.filter(report=self.reports[0]).order_by('-id')
+        assert_index_scan(queryset[:10], 'reports_history_report_id_idx')
+        assert_index_scan(queryset.filter(status=STATUS.completed)[:10], 'reports_history_report_id_idx')
+
+    def test_running(self):
+        assert_index_scan(History.objects.filter(status__in=BUSY).order_by('-id')[:10], 'reports_history_busy_idx')
@@ -0,0 +1,81 @@
+import time
+import datetime
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from srt.core.tests import benchmark
+from srt.reports.models import History
+from srt.reports.sources import iterate, values, copy, fetch, check_query, get_sql
+from srt.reports.tests.factories import ReportFactory
+
+
+class SourcesTestCase(TransactionTestCase):
+    """ copy() exports on a connection of its own, which only sees committed rows. """
+    rows = 20000
+
+    def setUp(self):
+        report = ReportFactory()
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO reports_history (created, modified, report_id, status, params, msg, coalesced, progress)
+                SELECT now(), now(), %s, 'pending', '{}', 'msg, "' || i || '"', 0, 0
+                FROM generate_series(0, %s - 1) AS i
+            ''', [report.id, self.rows])
+
+    def test_sources__same_rows(self):
+        queryset = History.objects.filter(msg__endswith='"7"').order_by('id')
+        expected = [(h.id, h.msg) for h in iterate(queryset)]
+        assert len(expected) == 1
+        assert list(values(queryset, ['id', 'msg'])) == expected
+        assert [(int(id), msg) for id, msg in copy(queryset.values_list('id', 'msg'))] == expected
+        assert list(copy('SELECT %s, NULL', ['a,b'])) == [['a,b', '']]
+
+    def test_copy__queries_while_exporting(self):
+        rows = copy(History.objects.values_list('id', 'msg'))
+        for i, row in enumerate(rows):
+            if i % 5000 == 0:  # the export is blocked on the full pipe meanwhile
+                History.objects.filter(id=int(row[0])).update(msg='seen')
+        assert History.objects.filter(msg='seen').count() == 4
+
+    def test_copy__early_close(self):
+        rows = copy(History.objects.values_list('id'))
+        assert len(next(rows)) == 1
+        rows.close()
+        assert History.objects.count() == self.rows
+
+    @benchmark
+    def test_benchmark__throughput(self):
+        queryset = History.objects.order_by('id')
+        sources = [
+            ('orm', lambda: ((h.id, h.msg, h.created) for h in iterate(queryset))),
+            ('values_list', lambda: values(queryset, ['id', 'msg', 'created'])),
+            ('copy', lambda: copy(queryset.values_list('id', 'msg', 'created'))),
+        ]
+        rates = {}
+        for name, source in sources:
+            started = time.monotonic()
+            count = sum(1 for _ in source())
+            rates[name] = count / (time.monotonic() - started)
+            assert count == self.rows
+        assert rates['copy'] > rates['orm'], ', '.join(f'{name}: {rate:.0f} rows/s' for name, rate in rates.items())
+
+
+class QueryTestCase(TestCase):
+
+    def test_fetch__typed_rows(self):
+        rows = fetch('SELECT %s::int, NULL, %s::date', [1, '2019-08-01'])
+        assert list(rows) == [(1, None, datetime.date(2019, 8, 1))]
+
+    def test_get_sql__bound_whenever_params_are_given(self):
+        assert get_sql("SELECT '%%'", {}) == "SELECT '%'"
+        assert get_sql("SELECT '%%', %s", ['a']) == "SELECT '%', 'a'"
+        assert get_sql("SELECT '%'") == "SELECT '%'"
+        assert list(fetch("SELECT '%%'", {})) == [('%',)]
+
+    def test_check_query(self):
+        assert check_query('SELECT 1;\n') == 'SELECT 1'
+        assert check_query("WITH a AS (SELECT ')') SELECT * FROM a") == "WITH a AS (SELECT ')') SELECT * FROM a"
+        for sql in ['SELECT 1; SELECT 2', 'SELECT 1) TO STDOUT WITH CSV --', 'UPDATE reports_report SET name = 1']:
+            with self.assertRaises(ValueError):
+                check_query(sql)
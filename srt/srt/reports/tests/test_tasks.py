@@ -0,0 +1,328 @@
+import io
+import gzip
+import json
+from unittest.mock import Mock, patch
+
+import redis
+from celery.exceptions import Retry, MaxRetriesExceededError
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+
+from srt.core.models import STATUS
+from srt.core.routers import get_sql_alias
+from srt.reports.models import Report, History, CONCURRENCY
+from srt.reports.tasks.report1 import Report1
+from srt.reports.tasks.sql import SQLReport
+from srt.reports.tests.factories import ReportFactory, HistoryFactory
+
+
+class FakeS3:
+    objects = {}
+
+    def __init__(self, *args, **kw):
+        pass
+
+    def open(self, remote, **kw):
+        s3 = self
+
+        class Writer(io.BytesIO):
+            def __exit__(self, *args):
+                s3.objects[remote] = self.getvalue()
+        return Writer()
+
+    def exists(self, remote):
+        return remote in self.objects
+
+    def stream(self, remote):
+        yield self.objects[remote]
+
+    def get_url(self, remote):
+        return remote
+
+    def delete(self, remote):
+        self.objects.pop(remote)
+
+    def list(self, remote, **kw):
+        return [key[len(remote) + 1:] for key in self.objects if key.startswith(f'{remote}/')]
+
+
+class FakeLease:
+    holders = {}
+
+    def __init__(self, name, value='', token=None, **kw):
+        self.name, self.value = name, token or value
+        self.token = self.value
+
+    def acquire(self):
+        return self.holders.setdefault(self.name, self.value) == self.value
+
+    def extend(self, ttl=None):
+        return self.holders.get(self.name) == self.value
+
+    def stop(self):
+        pass
+
+    def release(self):
+        if self.holders.get(self.name) == self.value:
+            self.holders.pop(self.name)
+
+    def holder(self):
+        return self.holders.get(self.name)
+
+
+class DailyReport(Report1):
+    name = 'DailyReport'
+
+    def __init__(self):
+        self.generated = []
+
+    def columns(self, params):
+        return ['day', 'value']
+
+    def rows(self, history, params):
+        self.generated.append(params['start_date'])
+        yield [params['start_date'], 1]
+
+
+@patch('srt.reports.tasks.report1.S3', FakeS3)
+@patch('srt.reports.tasks.report1.Lease', FakeLease)
+@patch.object(Report1, 'deliver', lambda self, history: None)
+class IncrementalTestCase(TestCase):
+
+    def setUp(self):
+        FakeS3.objects = {}
+        self.task = DailyReport()
+
+    def launch(self, start, end, **params):
+        params = {'incremental': True, 'start_date': start, 'end_date': end, **params}
+        history = HistoryFactory(params=json.dumps(params))
+        self.task.run(history_id=history.id)
+        history.refresh_from_db()
+        assert history.status == STATUS.completed, history.msg
+        return FakeS3.objects[history.path]
+
+    def test_run__reuses_stored_partitions(self):
+        lines = self.launch('2019-08-01', '2019-08-03').decode().splitlines()
+        assert lines == ['day,value', '2019-08-01,1', '2019-08-02,1', '2019-08-03,1']
+        assert self.task.generated == ['2019-08-01', '2019-08-02', '2019-08-03']
+
+        self.task.generated = []
+        lines = self.launch('2019-08-02', '2019-08-04').decode().splitlines()
+        assert lines == ['day,value', '2019-08-02,1', '2019-08-03,1', '2019-08-04,1']
+        assert self.task.generated == ['2019-08-04']
+
+    def test_run__invalidated_partitions_are_regenerated(self):
+        self.launch('2019-08-01', '2019-08-02')
+        self.task.generated = []
+        self.launch('2019-08-01', '2019-08-02', invalidate=['2019-08-01'])
+        assert self.task.generated == ['2019-08-01']
+
+    def test_run__partitions_depend_on_params(self):
+        self.launch('2019-08-01', '2019-08-01')
+        data = self.launch('2019-08-01', '2019-08-01', format='csv.gz')
+        assert gzip.decompress(data) == b'day,value\r\n2019-08-01,1\r\n'
+        assert len([key for key in FakeS3.objects if key.startswith('partitions/')]) == 2
+
+
+@patch('srt.reports.tasks.report1.S3', FakeS3)
+@patch('srt.reports.tasks.report1.Lease', FakeLease)
+@patch.object(Report1, 'deliver', lambda self, history: None)
+class ConcurrencyTestCase(TestCase):
+
+    def setUp(self):
+        self.task = DailyReport()
+        self.running = HistoryFactory(status=STATUS.processing)
+        FakeLease.holders = {f'report-{self.running.report_id}': self.running.id}
+
+    def launch(self, concurrency):
+        self.running.report.modify(concurrency=concurrency)
+        history = HistoryFactory(report=self.running.report, params=json.dumps({'start_date': '2019-08-01'}))
+        self.task.run(history_id=history.id)
+        history.refresh_from_db()
+        self.running.refresh_from_db()
+        return history
+
+    def test_run__coalesce(self):
+        history = self.launch(CONCURRENCY.coalesce)
+        assert history.status == STATUS.stopped
+        assert self.running.coalesced == 1
+        assert self.task.generated == []
+
+    def test_run__skip(self):
+        history = self.launch(CONCURRENCY.skip)
+        assert history.status == STATUS.stopped
+        assert self.running.coalesced == 0
+
+    def test_run__queue(self):
+        with patch.object(DailyReport, 'retry', side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                self.launch(CONCURRENCY.queue)
+        assert retry.call_args[1]['kwargs'] == {'history_id': self.running.id + 1}
+        assert retry.call_args[1]['max_retries'] == settings.REPORTS_QUEUE_MAX_RETRIES
+
+    def test_run__queue_gives_up(self):
+        with patch.object(DailyReport, 'retry', side_effect=MaxRetriesExceededError):
+            with patch('srt.core.progress.publish') as publish:
+                history = self.launch(CONCURRENCY.queue)
+        assert history.status == STATUS.stopped
+        assert history.msg == f'gave up waiting for history {self.running.id}'
+        assert publish.call_args[1]['status'] == STATUS.stopped
+
+    def test_run__stops_are_published(self):
+        with patch('srt.core.progress.publish') as publish:
+            history = self.launch(CONCURRENCY.skip)
+        publish.assert_called_once_with(history, status=STATUS.stopped, progress=0,
+            msg=f'skipped while history {self.running.id} is running')
+
+    def test_run__releases_lease(self):
+        FakeLease.holders = {}
+        history = self.launch(CONCURRENCY.skip)
+        assert history.status == STATUS.completed
+        assert FakeLease.holders == {}
+
+    def test_run__acquires_again_when_the_holder_left(self):
+        with patch.object(FakeLease, 'holder', side_effect=[None, self.running.id]) as holder:
+            history = self.launch(CONCURRENCY.coalesce)
+        assert holder.call_count == 2
+        assert history.msg == f'coalesced into history {self.running.id}'
+
+    def test_run__release_errors_do_not_fail_the_run(self):
+        FakeLease.holders = {}
+        with patch.object(FakeLease, 'release', side_effect=redis.RedisError):
+            history = self.launch(CONCURRENCY.skip)
+        assert history.status == STATUS.completed
+
+
+@patch('srt.reports.tasks.report1.S3', FakeS3)
+@patch('srt.reports.tasks.report1.Lease', FakeLease)
+@patch.object(Report1, 'deliver', lambda self, history: None)
+@patch.object(DailyReport, 'request', Mock(id='beat'))
+class BeatTestCase(TestCase):
+
+    def setUp(self):
+        FakeS3.objects = {}
+        FakeLease.holders = {}
+        self.report = ReportFactory(params=json.dumps({'start_date': '2019-08-01'}))
+
+    def test_run__beat(self):
+        DailyReport().run(report_id=self.report.id)
+        history, = History.objects.all()
+        assert history.status == STATUS.completed and history.task_id == 'beat'
+        assert history.params_hash == History.get_params_hash(self.report, history.params)
+
+    def test_run__beat_attaches_to_running_launch(self):
+        running = self.report.launch()
+        task = DailyReport()
+        task.run(report_id=self.report.id)
+        assert list(History.objects.all()) == [running]
+        assert task.generated == []
+
+
+@patch('srt.reports.tasks.report1.S3', FakeS3)
+@patch('srt.reports.tasks.report1.Lease', FakeLease)
+@patch.object(Report1, 'deliver', lambda self, history: None)
+class MapReduceTestCase(TestCase):
+
+    def setUp(self):
+        FakeS3.objects = {}
+        FakeLease.holders = {}
+        self.task = DailyReport()
+
+    def test_partitions(self):
+        params = {'start_date': '2019-08-01', 'end_date': '2019-08-10', 'partition_days': 4}
+        assert [(p['start_date'], p['end_date']) for p in self.task.partitions(params)] == [
+            ('2019-08-01', '2019-08-04'), ('2019-08-05', '2019-08-08'), ('2019-08-09', '2019-08-10')]
+        assert self.task.partitions({**params, 'partition_days': 10}) is None
+        assert self.task.partitions({}) is None
+
+    def run_chord(self):
+        params = {'start_date': '2019-08-01', 'end_date': '2019-08-03', 'partition_days': 1}
+        history = HistoryFactory(params=json.dumps(params))
+        with patch('srt.reports.tasks.report1.chord') as chord:
+            self.task.run(history_id=history.id)
+        parts, = chord.call_args[0]
+        merge, = chord.return_value.call_args[0]
+        history.refresh_from_db()
+        return history, parts, merge
+
+    def test_run__chord_of_parts_and_merge(self):
+        history, parts, merge = self.run_chord()
+        assert history.status == STATUS.processing
+        assert len(parts) == 3
+        assert FakeLease.holders == {f'report-{history.report_id}': history.id}  # held until the merge
+
+        keys = [self.task.write_part(history, *part.args[2:]) for part in parts]
+        self.task.merge(history, keys, *merge.args[2:])
+        history.refresh_from_db()
+        assert history.status == STATUS.completed
+        assert FakeS3.objects[history.path].decode().splitlines() == [
+            'day,value', '2019-08-01,1', '2019-08-02,1', '2019-08-03,1']
+        assert not any(key in FakeS3.objects for key in keys)
+        assert FakeLease.holders == {}
+
+    def test_run__failed_part_deletes_parts_and_releases(self):
+        history, parts, merge = self.run_chord()
+        self.task.write_part(history, *parts[0].args[2:])
+        abort, = merge.options['link_error']
+        self.task.abort(history, *abort.args[2:])
+        assert FakeS3.objects == {}
+        assert FakeLease.holders == {}
+
+
+@patch('srt.reports.tasks.report1.S3', FakeS3)
+@patch('srt.reports.tasks.report1.Lease', FakeLease)
+@patch.object(Report1, 'deliver', lambda self, history: None)
+class SQLReportTestCase(TransactionTestCase):
+    databases = {'default', 'default_sql'}  # the sql runs on its own connection, it only sees committed rows
+    sql = "SELECT id, name FROM reports_report WHERE name LIKE %(prefix)s || '%%' ORDER BY id"
+
+    def setUp(self):
+        FakeS3.objects = {}
+        FakeLease.holders = {}
+        self.reports = [ReportFactory(name=name) for name in ['a, 1', 'a2', 'b']]
+
+    def launch(self, **params):
+        history = HistoryFactory(report=self.reports[2], params=json.dumps({'sql': self.sql, 'prefix': 'a', **params}))
+        SQLReport().run(history_id=history.id)
+        history.refresh_from_db()
+        return history
+
+    def test_run__copy_formats(self):
+        history = self.launch(format='csv.gz')
+        assert history.status == STATUS.completed, history.msg
+        assert gzip.decompress(FakeS3.objects[history.path]).decode().splitlines() == [
+            'id,name', f'{self.reports[0].id},"a, 1"', f'{self.reports[1].id},a2']
+
+    def test_run__pipeline_formats(self):
+        self.sql = self.sql.replace('id, name', 'id, name, description')
+        history = self.launch(format='jsonl')
+        lines = FakeS3.objects[history.path].decode().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {'id': self.reports[0].id, 'name': 'a, 1', 'description': None},
+            {'id': self.reports[1].id, 'name': 'a2', 'description': None}]
+
+    def test_run__literal_percent_without_params(self):
+        history = HistoryFactory(report=self.reports[2], params=json.dumps({'sql': "SELECT '100%%' AS share"}))
+        SQLReport().run(history_id=history.id)
+        history.refresh_from_db()
+        assert FakeS3.objects[history.path].decode().splitlines() == ['share', '100%']
+
+    def test_run__single_select(self):
+        for self.sql in ['DELETE FROM reports_report RETURNING id',
+                         'SELECT 1) TO STDOUT WITH CSV; COMMIT; DELETE FROM reports_report; --']:
+            history = self.launch()
+            assert history.status == STATUS.failed
+            assert history.msg.startswith('The query must be')
+        assert Report.objects.count() == 3
+
+    def test_run__read_only(self):
+        self.sql = "SELECT nextval('reports_report_id_seq')"
+        history = self.launch()
+        assert history.status == STATUS.failed
+        assert 'read-only' in history.msg
+
+    def test_sql_alias__read_only_session(self):
+        with connections[get_sql_alias()].cursor() as cursor:
+            cursor.execute('SHOW default_transaction_read_only')
+            assert cursor.fetchone() == ('on',)
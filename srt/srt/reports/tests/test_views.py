@@ -0,0 +1,88 @@
+import time
+import base64
+from urllib.parse import urlencode
+from unittest.mock import patch
+
+from django.db import connection
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.status import HTTP_200_OK
+
+from srt.core.tests import BaseTestCase, benchmark
+from srt.reports.models import History
+from srt.reports.tests.factories import ReportFactory, HistoryFactory
+from srt.reports.views import HistoryViewSet
+from srt.users.tests.factories import UserFactory, StaffUserFactory
+
+
+class HistoryViewSetTestCase(BaseTestCase):
+    list_url = 'history-list'
+
+    def setUp(self):
+        self.client.force_authenticate(UserFactory())
+
+    def test_list__cursor_pages(self):
+        report = ReportFactory()
+        histories = [HistoryFactory(report=report) for _ in range(5)]
+        response = self.client.get(self.get_list_url(), {'limit': 2, 'report': report.id})
+        assert response.status_code == HTTP_200_OK
+        assert [h['id'] for h in response.data['results']] == [histories[4].id, histories[3].id]
+        seen = [h['id'] for h in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [h['id'] for h in response.data['results']]
+        assert seen == [h.id for h in reversed(histories)]
+
+
+class ReportViewSetTestCase(BaseTestCase):
+    list_url = 'report-list'
+    detail_url = 'report-detail'
+
+    def test_update__params_are_staff_only(self):
+        report = ReportFactory(params='{}')
+        data = {'name': 'sql', 'params': '{"sql": "SELECT 1"}'}
+        self.client.force_authenticate(UserFactory())
+        assert self.client.patch(self.get_detail_url(report.id), data).status_code == HTTP_200_OK
+        report.refresh_from_db()
+        assert (report.name, report.params) == ('sql', '{}')
+        self.client.force_authenticate(StaffUserFactory())
+        self.client.patch(self.get_detail_url(report.id), data)
+        report.refresh_from_db()
+        assert report.params == data['params']
+
+
+@benchmark
+class HistoryPaginationBenchmarkTestCase(BaseTestCase):
+    list_url = 'history-list'
+    rows = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        report = ReportFactory()
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO reports_history (created, modified, report_id, status, params, coalesced, progress)
+                SELECT now(), now(), %s, 'completed', '{}', 0, 100 FROM generate_series(1, %s)
+            ''', [report.id, cls.rows])
+            cursor.execute('ANALYZE reports_history')
+        cls.last_id = History.objects.order_by('id').values_list('id', flat=True).first()
+
+    def setUp(self):
+        self.client.force_authenticate(UserFactory())
+
+    def fetch(self, runs=5, **params):
+        started = time.monotonic()
+        for _ in range(runs):
+            response = self.client.get(self.get_list_url(), params)
+            assert len(response.data['results']) == 10
+        return (time.monotonic() - started) / runs
+
+    def test_benchmark__deep_page(self):
+        deep_cursor = base64.b64encode(urlencode({'p': self.last_id + 10}).encode()).decode()
+        first = self.fetch(limit=10)
+        deep = self.fetch(limit=10, cursor=deep_cursor)
+        with patch.object(HistoryViewSet, 'pagination_class', LimitOffsetPagination):
+            offset = self.fetch(limit=10, offset=self.rows - 10)
+        print(f'\nhistory page at row {self.rows}: {offset * 1000:.1f}ms offset, {deep * 1000:.1f}ms cursor '
+              f'({first * 1000:.1f}ms first page)')
+        assert deep < offset
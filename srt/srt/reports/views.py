@@ -3,20 +3,28 @@ from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import ModelViewSet
 
+from srt.core.pagination import IdCursorPagination
 from srt.reports.models import Report, History
-from srt.reports.serializers import ReportSerializer, HistorySerializer
+from srt.reports.serializers import StaffReportSerializer, ReportSerializer, StaffHistorySerializer, \
+    HistorySerializer
 
 
 class ReportViewSet(ModelViewSet):
     queryset = Report.objects.all()
-    serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]
     search_fields = ['name', 'description']
 
+    def get_serializer_class(self):
+        return StaffReportSerializer if self.request.user.is_staff else ReportSerializer
+
 
 class HistoryViewSet(ModelViewSet):
     queryset = History.objects.all()
-    serializer_class = HistorySerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]
+    pagination_class = IdCursorPagination
+    filter_backends = [SearchFilter, DjangoFilterBackend]
+    filterset_fields = ['report', 'status']
+
+    def get_serializer_class(self):
+        return StaffHistorySerializer if self.request.user.is_staff else HistorySerializer
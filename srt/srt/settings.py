@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 import os
 import datetime
 
+from celery.schedules import crontab
+
 NAME = 'SRT'
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -100,6 +102,7 @@ DATABASES = {
         'PASSWORD': os.environ['DATABASE_PASSWORD'],
         'HOST': os.environ['DATABASE_HOST'],
         'PORT': os.environ['DATABASE_PORT'],
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 300)),  # seconds, persistent connections
         'TEST': {
             'NAME': os.environ['TEST_DATABASE_NAME'],   # name to use for testrunner db
             'CHARSET': 'utf8',
@@ -107,6 +110,32 @@ DATABASES = {
     }
 }
 
+# read replicas, report tasks read their data from them, see srt.core.routers
+DATABASE_REPLICAS = []
+for index, host in enumerate([h.strip() for h in os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',') if h], 1):
+    DATABASE_REPLICAS.append(f'replica{index}')
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+# sql written by users (SQL reports) runs on a read only companion <alias>_sql of each database above, logged in as
+# DATABASE_SQL_USER: a role granted SELECT only, so that no query can write whatever it contains
+# (the main user when unset, with a warning: see srt.core.checks)
+DATABASE_SQL_USER = os.environ.get('DATABASE_SQL_USER')
+DATABASE_SQL_ALIASES = []
+for alias in list(DATABASES):
+    DATABASE_SQL_ALIASES.append(f'{alias}_sql')
+    DATABASES[f'{alias}_sql'] = {
+        **DATABASES[alias],
+        'USER': DATABASE_SQL_USER or DATABASES[alias]['USER'],
+        'PASSWORD': os.environ.get('DATABASE_SQL_PASSWORD', DATABASES[alias]['PASSWORD']),
+        'CONN_MAX_AGE': 0,  # no session settings changed by a query outlive it
+        'OPTIONS': {'options': '-c default_transaction_read_only=on'},
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['srt.core.routers.ReplicaRouter']
+DATABASE_HEALTH_CHECK_IDLE = int(os.environ.get('DATABASE_HEALTH_CHECK_IDLE', 30))  # idle seconds before a check
+DATABASE_STATS_INTERVAL = int(os.environ.get('DATABASE_STATS_INTERVAL', 3600))  # seconds between connection stats logs
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DATABASE_REPLICA_MAX_LAG', 30))  # seconds, primary beyond it
+DATABASE_REPLICA_LAG_CHECK = int(os.environ.get('DATABASE_REPLICA_LAG_CHECK', 10))  # seconds between checks
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -161,11 +190,18 @@ AWS_KEY = os.environ['AWS_KEY']
 AWS_SECRET = os.environ['AWS_SECRET']
 AWS_BUCKET = os.environ['AWS_BUCKET']
 AWS_S3_BASE_URL = f"https://{os.environ['AWS_BUCKET']}.s3.amazonaws.com"
+AWS_S3_PART_SIZE = int(os.environ.get('AWS_S3_PART_SIZE', 8 * 1024 * 1024))  # 8 MB, at least 5 MB
+AWS_S3_MAX_INFLIGHT = int(os.environ.get('AWS_S3_MAX_INFLIGHT', 4))  # parts uploaded at once
+AWS_S3_DOWNLOAD_WORKERS = int(os.environ.get('AWS_S3_DOWNLOAD_WORKERS', 4))  # parallel ranged downloads
+AWS_S3_DOWNLOAD_CHUNK_SIZE = int(os.environ.get('AWS_S3_DOWNLOAD_CHUNK_SIZE', 8))  # MB
 
 # redis / celery
 CELERY_DATE_FORMAT = '%Y-%m-%d %H:%M:%S %z'
 CELERY_BROKER_URL = os.environ['CELERY_BROKER_URL']
-BROKER_TRANSPORT_OPTIONS = {'socket_timeout': 300}  # 5 minutes
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'socket_timeout': 300,  # 5 minutes
+    'visibility_timeout': 3600,  # 1 hour, unacked tasks are redelivered after it: keep countdowns well below
+}
 CELERY_RESULT_BACKEND = os.environ['CELERY_RESULT_BACKEND']
 CELERY_TASK_RESULT_EXPIRES = 3600  # 1 hour
 CELERY_TASK_DEFAULT_EXCHANGE_TYPE = "direct"
@@ -198,6 +234,22 @@ CELERY_TASK_ROUTES = {
         "queue": "celery-reports",
         "routing_key": "report.report2",
     },
+    "srt.reports.tasks.sql.SQLReport": {
+        "queue": "celery-reports",
+        "routing_key": "report.sql",
+    },
+    "srt.reports.tasks.chunked.ReportPart": {
+        "queue": "celery-reports",
+        "routing_key": "report.part",
+    },
+    "srt.reports.tasks.chunked.ReportMerge": {
+        "queue": "celery-reports",
+        "routing_key": "report.merge",
+    },
+    "srt.reports.tasks.chunked.ReportAbort": {
+        "queue": "celery-reports",
+        "routing_key": "report.abort",
+    },
     "srt.deliveries.tasks.s3.S3Transport": {
         "queue": "celery-deliveries",
         "routing_key": "delivery.s3",
@@ -214,15 +266,56 @@ CELERY_TASK_ROUTES = {
         "queue": "celery-deliveries",
         "routing_key": "delivery.email",
     },
+    "srt.deliveries.tasks.relaunch.RelaunchFailed": {
+        "queue": "celery-deliveries",
+        "routing_key": "delivery.relaunch",
+    },
+    "srt.core.tasks.Retention": {
+        "queue": "celery-reports",
+        "routing_key": "report.retention",
+    },
 }
 CELERY_IMPORTS = [
     "srt.reports.tasks.report1",
     "srt.reports.tasks.report2",
+    "srt.reports.tasks.sql",
+    "srt.reports.tasks.chunked",
     "srt.deliveries.tasks.s3",
     "srt.deliveries.tasks.ftp",
     "srt.deliveries.tasks.sftp",
     "srt.deliveries.tasks.email",
+    "srt.deliveries.tasks.relaunch",
+    "srt.core.tasks",
 ]
+CELERY_BEAT_SCHEDULE = {
+    'history-retention': {
+        'task': 'srt.core.tasks.Retention',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# reports
+REPORTS_CACHE_TTL = int(os.environ.get('REPORTS_CACHE_TTL', 3600))  # seconds a result is reused, 0 disables
+REPORTS_PENDING_TTL = int(os.environ.get('REPORTS_PENDING_TTL', 3600))  # seconds a pending launch is attached to
+
+REPORTS_LEASE_TTL = int(os.environ.get('REPORTS_LEASE_TTL', 60))  # seconds a report lease outlives its heartbeat
+REPORTS_CHORD_LEASE_TTL = int(os.environ.get('REPORTS_CHORD_LEASE_TTL', 3600))  # seconds between chunk tasks
+REPORTS_QUEUE_COUNTDOWN = int(os.environ.get('REPORTS_QUEUE_COUNTDOWN', 30))  # seconds between queued retries
+REPORTS_QUEUE_MAX_RETRIES = int(os.environ.get('REPORTS_QUEUE_MAX_RETRIES', 100))  # retries before a queued run stops
+PROGRESS_FLUSH_INTERVAL = int(os.environ.get('PROGRESS_FLUSH_INTERVAL', 5))  # seconds between history writes
+EVENTS_HEARTBEAT = int(os.environ.get('EVENTS_HEARTBEAT', 15))  # seconds between keepalives of idle event streams
+EVENTS_MAX_AGE = int(os.environ.get('EVENTS_MAX_AGE', 300))  # seconds an event stream lasts before clients reconnect
+EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 1))  # event streams per process, keep below its threads
+
+# deliveries
+DELIVERIES_BATCH_SIZE = int(os.environ.get('DELIVERIES_BATCH_SIZE', 1000))  # histories inserted and relaunched at once
+DELIVERIES_RELAUNCH_RATE = float(os.environ.get('DELIVERIES_RELAUNCH_RATE', 1))  # relaunches per second and target
+DELIVERIES_MAX_COUNTDOWN = int(os.environ.get('DELIVERIES_MAX_COUNTDOWN', 600))  # seconds a relaunch is delayed at most
+
+# retention
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 180))  # histories archived after, 0 keeps all
+HISTORY_RETENTION_BATCH_SIZE = int(os.environ.get('HISTORY_RETENTION_BATCH_SIZE', 10000))  # rows per archive
+HISTORY_PARTITIONS_AHEAD = int(os.environ.get('HISTORY_PARTITIONS_AHEAD', 3))  # months created ahead
 
 # auth
 SIMPLE_JWT = {
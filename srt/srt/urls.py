@@ -5,6 +5,7 @@ from django.urls import path, include
 from rest_framework import routers
 from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
+from srt.core.views import EventsView
 from srt.users.views import UserViewSet, ChangePasswordView, SRTTokenObtainPairView
 from srt.reports.views import ReportViewSet, HistoryViewSet
 
@@ -31,4 +32,5 @@ urlpatterns = [
     # our apps
     path('api/v1/', include(router.urls)),
     path('api/v1/change/password/', ChangePasswordView.as_view(), name='change_password'),
+    path('api/v1/events/', EventsView.as_view(), name='events'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)